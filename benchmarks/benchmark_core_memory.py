@@ -0,0 +1,66 @@
+"""
+Measures the memory used by a large synthetic Graph document model, in bytes
+per node and per text run, both as imported and with its text runs compacted 
+into GTextRuns.
+
+Usage: python benchmarks/benchmark_core_memory.py [number of text runs]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from graph.core import *
+
+
+def makeDocument(n):
+    document = GDocument()
+    section = GSection()
+    section.document = document
+    document.sections.append(section)
+    numberOfRuns = 0
+    numberOfNodes = 1
+
+    while numberOfRuns < n:
+        p = GParagraph()
+        section.subelements.append(p)
+        numberOfNodes += 1
+
+        for i in range(5):
+            p.subelements.append(GTextElement("Some text in run {} ".format(numberOfRuns)))
+
+            b = GBold()
+            b.subelements.append(GTextElement("bold {}".format(numberOfRuns + 1)))
+            p.subelements.append(b)
+
+            numberOfRuns += 2
+            numberOfNodes += 3
+
+    return document, numberOfNodes, numberOfRuns
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    tracemalloc.start()
+
+    m1 = tracemalloc.get_traced_memory()[0]
+    document, numberOfNodes, numberOfRuns = makeDocument(n)
+    m2 = tracemalloc.get_traced_memory()[0]
+    document.compactTextRuns()
+    m3 = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    print("Text runs:                   {:>12,}".format(numberOfRuns))
+    print("Nodes:                       {:>12,}".format(numberOfNodes))
+    print("Model size:                  {:>12,} bytes".format(m2 - m1))
+    print("Bytes per node:              {:>12,.1f}".format((m2 - m1) / numberOfNodes))
+    print("Bytes per text run:          {:>12,.1f}".format((m2 - m1) / numberOfRuns))
+    print("Compacted model size:        {:>12,} bytes".format(m3 - m1))
+    print("Compacted bytes per run:     {:>12,.1f}".format((m3 - m1) / numberOfRuns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures how long XMLExporter takes to export a large XML tree, shaped like
+the HTML documents that HTMLExporter builds.
+
+Usage: python benchmarks/benchmark_xml_export.py [number of elements] [number of repetitions]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from graph.xml import *
+
+
+def makeDocument(n):
+    body = XMLElement("body")
+    numberOfElements = 1
+
+    while numberOfElements < n:
+        section = XMLElement("section")
+        section.attributes.append(XMLAttribute("class", "section"))
+        body.subelements.append(section)
+        numberOfElements += 1
+
+        for i in range(10):
+            p = XMLElement("p")
+            p.attributes.append(XMLAttribute("class", "paragraph"))
+            p.subelements.append(XMLTextElement("Some text in "))
+
+            b = XMLElement("span")
+            b.setLineBreaks(False, False, False, False)
+            b.attributes.append(XMLAttribute("style", "font-weight: bold;"))
+            b.subelements.append(XMLTextElement("bold"))
+            p.subelements.append(b)
+            p.subelements.append(XMLTextElement(" and a line break"))
+
+            br = XMLElement("br")
+            br.isSelfClosing = True
+            br.setLineBreaks(False, False, False, False)
+            p.subelements.append(br)
+
+            section.subelements.append(p)
+            numberOfElements += 3
+
+    html = XMLElement("html")
+    html.subelements.append(body)
+
+    return XMLDocument(HTML5Declaration(), html), numberOfElements + 1
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    document, numberOfElements = makeDocument(n)
+
+    t = min(timeit.repeat(lambda: XMLExporter().exportDocument(document), number=1, repeat=repetitions))
+
+    print("Elements:             {:>12,}".format(numberOfElements))
+    print("Output size:          {:>12,} characters".format(len(XMLExporter().exportDocument(document))))
+    print("Export time:          {:>12,.3f} s".format(t))
+    print("Elements per second:  {:>12,.0f}".format(numberOfElements / t))
+
+
+if __name__ == "__main__":
+    main()
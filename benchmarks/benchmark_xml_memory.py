@@ -0,0 +1,59 @@
+"""
+Measures the memory used by the XML tree that XMLParser builds for a large 
+Graph document, in bytes per node.
+
+Usage: python benchmarks/benchmark_xml_memory.py [number of copies of the example sections]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from graph.xml import *
+
+
+def makeDocument(n):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "example1.graph.xml"), "r", encoding="utf-8") as fo:
+        t = fo.read()
+
+    a = t.index("<sections>") + len("<sections>")
+    b = t.index("</sections>")
+
+    return t[:a] + n * t[a:b] + t[b:]
+
+
+def countNodes(element):
+    return 1 + sum(1 for e in element.iterDescendants())
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    inputText = makeDocument(n)
+    parser = XMLParser()
+
+    tracemalloc.start()
+
+    s1 = tracemalloc.take_snapshot()
+    m1 = tracemalloc.get_traced_memory()[0]
+    document = parser.parseDocument(inputText)
+    m2 = tracemalloc.get_traced_memory()[0]
+    s2 = tracemalloc.take_snapshot()
+
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in s2.compare_to(s1, "filename"))
+
+    nodes = countNodes(document.root)
+    textSize = sum(sys.getsizeof(e.text) for e in document.root.iterDescendants() if isinstance(e, XMLTextElement))
+
+    print("Source size:                 {:>12,} characters".format(len(inputText)))
+    print("Nodes:                       {:>12,}".format(nodes))
+    print("Tree size:                   {:>12,} bytes".format(m2 - m1))
+    print("Bytes per node:              {:>12,.1f}".format((m2 - m1) / nodes))
+    print("Bytes per node without text: {:>12,.1f}".format((m2 - m1 - textSize) / nodes))
+    print("Allocated blocks per node:   {:>12,.2f}".format(blocks / nodes))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping, MutableSequence
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import xml.etree.ElementTree as et
 import re
 from graph.xml import *
 from morph.core import *
@@ -19,23 +22,374 @@ class GContributor(object):
         self.website = ""
 
 
+class GStyleProperties(MutableMapping):
+    """
+    The style properties of a Graph element. All of the elements of a type share 
+    one table of default style properties, and an element is only given a table 
+    of its own, copied from the defaults, when one of its properties is changed. 
+    This is a view of whichever of the two tables an element is using, and it 
+    reads and writes like a dict.
+
+    Parameters
+    ----------
+    element : GTextElement or GContentElement
+        The element whose style properties these are
+    """
+    __slots__ = ("_element",)
+
+    def __init__(self, element):
+        self._element = element
+
+    def _getTable(self):
+        e = self._element
+
+        return type(e)._defaultStyleProperties if e._styleProperties == None else e._styleProperties
+
+    def _getOwnTable(self):
+        e = self._element
+
+        if e._styleProperties == None:
+            e._styleProperties = dict(type(e)._defaultStyleProperties)
+
+        return e._styleProperties
+
+    def __getitem__(self, name):
+        return self._getTable()[name]
+
+    def __setitem__(self, name, value):
+        e = self._element
+
+        # Setting a property to the value it already has doesn't need a table 
+        # of its own, which is usually the case when properties are cascaded.
+        if e._styleProperties == None:
+            defaults = type(e)._defaultStyleProperties
+
+            if name in defaults and defaults[name] == value:
+                return
+
+        self._getOwnTable()[name] = value
+
+    def __delitem__(self, name):
+        del self._getOwnTable()[name]
+
+    def __contains__(self, name):
+        return name in self._getTable()
+
+    def __iter__(self):
+        return iter(self._getTable())
+
+    def __len__(self):
+        return len(self._getTable())
+
+    def get(self, name, default=None):
+        return self._getTable().get(name, default)
+
+    def __repr__(self):
+        return "GStyleProperties({!r})".format(self._getTable())
+
+
+def _getStyleProperties(self):
+    return GStyleProperties(self)
+
+
+def _setStyleProperties(self, value):
+    self._styleProperties = dict(value)
+
+
 class GTextElement(object):
     """
     Represents a Graph text element. Text elements can have style properties, but these 
     are always inherited from the containing element.
     """
 
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-weight": "inherit",
+        "font-height": "inherit",
+        "font-variant": "inherit",
+        "font-slant": "inherit",
+    }
+
+    __slots__ = ("text", "_styleProperties")
+
     def __init__(self, text=""):
 
         self.text = text
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-weight": "inherit",
-            "font-height": "inherit",
-            "font-variant": "inherit",
-            "font-slant": "inherit",
-        }
+        self._styleProperties = None
+
+    styleProperties = property(_getStyleProperties, _setStyleProperties)
+
+
+class GTextStyleTable(object):
+    """
+    A table of the distinct style properties of the text runs in a document, 
+    which GTextRuns refer to by number. Number 0 is the default style properties 
+    of GTextElement.
+    """
+
+    def __init__(self):
+        self.styles = [None]
+        self._styleIds = {}
+
+    def getStyleId(self, styleProperties):
+        """
+        Returns the number of the given style properties, adding them to the table 
+        if they aren't already in it.
+
+        Parameters
+        ----------
+        styleProperties : dict or None
+            The style properties, or None for the default style properties
+
+        Returns
+        -------
+        int
+            The number of the style properties
+        """
+        if styleProperties == None or styleProperties == GTextElement._defaultStyleProperties:
+            return 0
+
+        try:
+            key = tuple(styleProperties.items())
+            styleId = self._styleIds.get(key)
+        except TypeError:
+            # Style properties with unhashable values are stored, but not shared.
+            key = None
+            styleId = None
+
+        if styleId == None:
+            styleId = len(self.styles)
+            self.styles.append(dict(styleProperties))
+
+            if key != None:
+                self._styleIds[key] = styleId
+
+        return styleId
+
+
+class GTextRuns(MutableSequence):
+    """
+    A compact list of the subelements of a Graph content element. The text of its 
+    text runs is kept in one string, with the offsets of the runs in an array, and 
+    the style properties of each run are kept as a number in a GTextStyleTable. 
+    Its other subelements are kept as they are.
+
+    Reading a text run from the list makes a GTextRun for it, which reads and 
+    writes the text and style properties in the list. Adding or removing 
+    subelements rebuilds the list, after which the GTextRuns read from it before 
+    are no longer valid.
+
+    A GTextRuns takes up more memory than a list of a few GTextElements, so 
+    GContentElement.compactTextRuns only uses one for subelements with at least 
+    minimumNumberOfRuns text runs.
+
+    Parameters
+    ----------
+    subelements : iterable of GTextElement or GContentElement
+        The subelements
+    styleTable : GTextStyleTable
+        The style table to use, or None for a new one
+    """
+    __slots__ = ("_text", "_offsets", "_styleIds", "_styleTable", "_elementPositions", "_elements")
+
+    minimumNumberOfRuns = 3
+
+    def __init__(self, subelements=(), styleTable=None):
+        self._styleTable = GTextStyleTable() if styleTable == None else styleTable
+
+        self._setSubelements(subelements)
+
+    def _setSubelements(self, subelements):
+        texts = []
+        offsets = array("I", [0])
+        styleIds = array("I")
+        elementPositions = array("I")
+        elements = []
+        n = 0
+
+        for i, e in enumerate(subelements):
+            if type(e) is GTextElement or type(e) is GTextRun:
+                texts.append(e.text)
+                n += len(e.text)
+                offsets.append(n)
+                styleIds.append(self._styleTable.getStyleId(e._styleProperties))
+            else:
+                elementPositions.append(i)
+                elements.append(e)
+
+        self._text = "".join(texts)
+        self._offsets = offsets
+        self._styleIds = styleIds
+
+        # Many lists of subelements only have text runs, and they share one empty 
+        # tuple rather than each having an empty array and list.
+        if len(elements) > 0:
+            self._elementPositions = elementPositions
+            self._elements = elements
+        else:
+            self._elementPositions = ()
+            self._elements = ()
+
+    def _getIndex(self, i):
+        n = len(self)
+
+        if i < 0:
+            i += n
+
+        if i < 0 or i >= n:
+            raise IndexError("subelement index out of range")
+
+        return i
+
+    def __len__(self):
+        return len(self._styleIds) + len(self._elements)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        i = self._getIndex(i)
+        j = bisect_left(self._elementPositions, i)
+
+        if j < len(self._elementPositions) and self._elementPositions[j] == i:
+            return self._elements[j]
+        else:
+            return GTextRun(self, i - j)
+
+    def __setitem__(self, i, value):
+        subelements = list(self)
+        subelements[i] = value
+
+        self._setSubelements(subelements)
+
+    def __delitem__(self, i):
+        subelements = list(self)
+        del subelements[i]
+
+        self._setSubelements(subelements)
+
+    def insert(self, i, value):
+        subelements = list(self)
+        subelements.insert(i, value)
+
+        self._setSubelements(subelements)
+
+    def __iter__(self):
+        return self._iterate(False)
+
+    def __repr__(self):
+        return "GTextRuns({!r})".format(list(self))
+
+    def copy(self):
+        return list(self)
+
+    def iterTextsAndElements(self):
+        """
+        Iterates over the subelements, giving the text runs as strings, without 
+        making a GTextRun for each of them.
+        """
+        return self._iterate(True)
+
+    def _iterate(self, asText):
+        i = 0
+        r = 0
+
+        for position, element in zip(self._elementPositions, self._elements):
+            while i < position:
+                yield self._getText(r) if asText else GTextRun(self, r)
+
+                i += 1
+                r += 1
+
+            yield element
+
+            i += 1
+
+        for r in range(r, len(self._styleIds)):
+            yield self._getText(r) if asText else GTextRun(self, r)
+
+    def _getText(self, r):
+        return self._text[self._offsets[r]:self._offsets[r + 1]]
+
+    def _setText(self, r, text):
+        a = self._offsets[r]
+        b = self._offsets[r + 1]
+        d = len(text) - (b - a)
+
+        self._text = self._text[:a] + text + self._text[b:]
+
+        for k in range(r + 1, len(self._offsets)):
+            self._offsets[k] += d
+
+    def _getStyleProperties(self, r):
+        return self._styleTable.styles[self._styleIds[r]]
+
+    def _setStyleProperties(self, r, styleProperties):
+        self._styleIds[r] = self._styleTable.getStyleId(styleProperties)
+
+
+class GTextRunStyleProperties(GStyleProperties):
+    """
+    The style properties of a GTextRun. The style properties in a GTextStyleTable 
+    are shared, so rather than being changed in place, they're copied and the 
+    copy is added to the table.
+    """
+    __slots__ = ()
+
+    def __setitem__(self, name, value):
+        table = self._getTable()
+
+        if name in table and table[name] == value:
+            return
+
+        styleProperties = dict(table)
+        styleProperties[name] = value
+
+        self._element._styleProperties = styleProperties
+
+    def __delitem__(self, name):
+        styleProperties = dict(self._getTable())
+        del styleProperties[name]
+
+        self._element._styleProperties = styleProperties
+
+
+class GTextRun(GTextElement):
+    """
+    A text run in a GTextRuns.
+
+    Parameters
+    ----------
+    runs : GTextRuns
+        The list the text run is in
+    index : int
+        The number of the text run among the text runs in the list
+    """
+    __slots__ = ("_runs", "_index")
+
+    def __init__(self, runs, index):
+        self._runs = runs
+        self._index = index
+
+    def _getText(self):
+        return self._runs._getText(self._index)
+
+    def _setText(self, text):
+        self._runs._setText(self._index, text)
+
+    def _getOwnStyleProperties(self):
+        return self._runs._getStyleProperties(self._index)
+
+    def _setOwnStyleProperties(self, styleProperties):
+        self._runs._setStyleProperties(self._index, styleProperties)
+
+    def _getRunStyleProperties(self):
+        return GTextRunStyleProperties(self)
+
+    text = property(_getText, _setText)
+    _styleProperties = property(_getOwnStyleProperties, _setOwnStyleProperties)
+    styleProperties = property(_getRunStyleProperties, _setStyleProperties)
 
 
 class GContentElement(object):
@@ -46,6 +400,10 @@ class GContentElement(object):
     """
 
     _elementNames = []
+    _defaultStyleProperties = {}
+    _styleClassNamePattern = re.compile(r"[A-Za-z0-9_\-]+")
+
+    __slots__ = ("subelements", "id", "_styleClass", "_styleClassNames", "style", "_styleProperties", "language")
 
     def __init__(self):
 
@@ -56,110 +414,162 @@ class GContentElement(object):
         self.styleClass = ""
         self.style = ""
 
-        self.styleProperties = {}
+        self._styleProperties = None
 
         self.language = ""
 
+    styleProperties = property(_getStyleProperties, _setStyleProperties)
+
+    def compactTextRuns(self, styleTable=None):
+        """
+        Replaces the subelements of this element and of its descendants that have 
+        text runs with GTextRuns. This is best done once styles have been applied, 
+        since changing the style properties of a text run in a GTextRuns is slower 
+        than changing those of a GTextElement.
+
+        Parameters
+        ----------
+        styleTable : GTextStyleTable
+            The style table to use, or None for a new one
+        """
+        if styleTable == None:
+            styleTable = GTextStyleTable()
+
+        elements = [self]
+
+        while len(elements) > 0:
+            e = elements.pop()
+
+            if isinstance(e.subelements, GTextRuns):
+                elements.extend(s for s in e.subelements._elements if isinstance(s, GContentElement))
+            else:
+                elements.extend(s for s in e.subelements if isinstance(s, GContentElement))
+
+                if sum(1 for s in e.subelements if type(s) is GTextElement) >= GTextRuns.minimumNumberOfRuns:
+                    e.subelements = GTextRuns(e.subelements, styleTable)
+
+    @property
+    def styleClass(self):
+        return self._styleClass
+
+    @styleClass.setter
+    def styleClass(self, styleClass):
+        self._styleClass = styleClass
+        self._styleClassNames = None
+
     @property
     def styleClassNames(self):
-        cn = self.styleClass.split(" ")
-        cn = [s for s in cn if re.match("[A-Za-z0-9_\-]+", s)]
+        """
+        The names of the style classes of this element, as a frozenset. They are 
+        worked out the first time they're needed after styleClass is set.
+        """
+        if self._styleClassNames == None:
+            match = GContentElement._styleClassNamePattern.match
+
+            self._styleClassNames = frozenset(s for s in self._styleClass.split(" ") if match(s))
 
-        return cn
+        return self._styleClassNames
 
 
 class GParagraph(GContentElement):
     """
     Represents a Graph paragraph.
     """
+    __slots__ = ()
 
     _elementNames = ["paragraph", "p"]
 
-    def __init__(self):
-
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GHeading(GContentElement):
+    __slots__ = ("level",)
+
     _elementNames = ["heading1", "heading2", "heading3", "heading4", "heading5", "heading6", "heading7", "heading8", "heading9", "heading10", "h1", "h2", "h3", "h4", "h5", "h6", "h7", "h8", "h9", "h10"]
     _levels = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    _levelsByElementName = dict(zip(_elementNames, _levels))
+
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
     def __init__(self, level=1):
         super(GHeading, self).__init__()
 
         self.level = level
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
-
 
 class GDivision(GContentElement):
-    _elementNames = ["division", "d"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["division", "d"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GBold(GContentElement):
-    _elementNames = ["bold", "b"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["bold", "b"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "bold",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "bold",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GItalic(GContentElement):
-    _elementNames = ["italic", "i"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["italic", "i"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "italic",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "italic",
+        "text-alignment": "inherit",
+    }
 
 
 class GUnderline(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["underline", "u"]
 
 
 class GStrikethrough(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["strikethrough", "s"]
 
 
 class GHyperlink(GContentElement):
+    __slots__ = ("url", "title")
 
     _elementNames = ["hyperlink", "hl"]
 
@@ -171,158 +581,175 @@ class GHyperlink(GContentElement):
 
 
 class GLineBreak(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["line-break", "lb"]
 
 
 class GPageBreak(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["page-break", "pb"]
 
 
 class GHorizontalRule(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["horizontal-rule", "hr"]
 
 
 class GUnorderedList(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["unordered-list", "ul"]
 
 
 class GOrderedList(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["ordered-list", "ol"]
 
 
 class GListItem(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["list-item", "li"]
 
 
 class GDefinitionList(GContentElement):
-    _elementNames = ["definition-list", "dl"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["definition-list", "dl"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GDefinitionListTerm(GContentElement):
-    _elementNames = ["definition-list-term", "dlt"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["definition-list-term", "dlt"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GDefinitionListDefinition(GContentElement):
-    _elementNames = ["definition-list-definition", "dld"]
+    __slots__ = ()
 
-    def __init__(self):
-
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _elementNames = ["definition-list-definition", "dld"]
 
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GTable(GContentElement):
-    _elementNames = ["table"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["table"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
-        
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GTableRow(GContentElement):
-    _elementNames = ["table-row", "tr"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["table-row", "tr"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
-        
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GTableData(GContentElement):
-    _elementNames = ["table-data", "td"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["table-data", "td"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GVariable(GContentElement):
+    __slots__ = ("name",)
+
     _elementNames = ["variable", "v"]
 
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
+
     def __init__(self):
-        self.name = ""
+        super(GVariable, self).__init__()
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+        self.name = ""
 
 
 class GPageNumber(GContentElement):
-    _elementNames = ["page-number", "pn"]
+    __slots__ = ()
 
-    def __init__(self):
+    _elementNames = ["page-number", "pn"]
 
-        self.styleProperties = {
-            "font-name": "inherit",
-            "font-variant": "inherit",
-            "font-height": "inherit",
-            "font-weight": "inherit",
-            "font-slant": "inherit",
-            "text-alignment": "inherit",
-        }
+    _defaultStyleProperties = {
+        "font-name": "inherit",
+        "font-variant": "inherit",
+        "font-height": "inherit",
+        "font-weight": "inherit",
+        "font-slant": "inherit",
+        "text-alignment": "inherit",
+    }
 
 
 class GTableOfContents(GContentElement):
+    __slots__ = ()
+
     _elementNames = ["table-of-contents", "toc"]
 
 
 class GCitation(GContentElement):
+    __slots__ = ("reference",)
+
     _elementNames = ["citation", "c"]
 
     def __init__(self):
@@ -332,13 +759,17 @@ class GCitation(GContentElement):
 
 
 class GTemplate(GContentElement):
+    __slots__ = ("reference",)
+
     def __init__(self):
-        super(GContentElement, self).__init__()
+        super(GTemplate, self).__init__()
 
         self.reference = ""
 
 
 class GPageTemplate(GTemplate):
+    __slots__ = ("header", "footer")
+
     def __init__(self):
         super(GPageTemplate, self).__init__()
 
@@ -347,16 +778,16 @@ class GPageTemplate(GTemplate):
 
 
 class GHeader(GContentElement):
-    def __init__(self):
-        super(GContentElement, self).__init__()
+    __slots__ = ()
 
 
 class GFooter(GContentElement):
-    def __init__(self):
-        super(GContentElement, self).__init__()
+    __slots__ = ()
 
 
 class GSection(GContentElement):
+    __slots__ = ("document", "pageTemplateReference", "exclude")
+
     _elementNames = ["section"]
 
     def __init__(self):
@@ -422,6 +853,30 @@ class GDocument(object):
 
         return ""
 
+    def compactTextRuns(self):
+        """
+        Replaces the subelements of the elements of this document that have text 
+        runs with GTextRuns, which share one GTextStyleTable.
+
+        Returns
+        -------
+        GTextStyleTable
+            The style table
+        """
+        styleTable = GTextStyleTable()
+
+        for template in self.templates:
+            template.compactTextRuns(styleTable)
+
+            for e in [getattr(template, "header", None), getattr(template, "footer", None)]:
+                if e != None:
+                    e.compactTextRuns(styleTable)
+
+        for section in self.sections:
+            section.compactTextRuns(styleTable)
+
+        return styleTable
+
 
 class GLength(object):
     def __init__(self, number, unit):
@@ -479,15 +934,108 @@ def makeGLength(mlength):
 
 
 class GraphValidationError(Exception):
-    def __init__(self, message):
+    """
+    Raised when a Graph document file is well-formed XML but not a valid 
+    Graph document.
+
+    Parameters
+    ----------
+    message : str
+        A description of the error
+    xmlElement : XMLElement, optional
+        The element at which the error was found, which gives the line and 
+        column of the error if the element was parsed from text
+    line : int, optional
+        The line at which the error was found, if there is no element
+    column : int, optional
+        The column at which the error was found, if there is no element
+    """
+    def __init__(self, message, xmlElement=None, line=None, column=None):
         super(GraphValidationError, self).__init__(message)
 
+        self.message = message
+        self.line = line
+        self.column = column
+
+        location = xmlElement.getSourceLocation() if xmlElement != None else None
+
+        if location != None:
+            self.line, self.column = location
+
+    def __str__(self):
+        if self.line != None:
+            return "{0} (line {1}, column {2})".format(self.message, self.line, self.column)
+
+        return self.message
+
+    def __reduce__(self):
+        # The line and column are kept when the error is passed between processes.
+        return (type(self), (self.message, None, self.line, self.column))
+
+
+class _PageElementFactory(object):
+    """
+    Makes the Graph elements of one type for GImporter. This is a class rather 
+    than a closure so that it can be pickled, and so handed to the processes 
+    that import sections in parallel.
+
+    Parameters
+    ----------
+    elementType : type
+        The type of the Graph elements
+    configure : function, optional
+        A function that is called with the importer, the element and the XML 
+        element, to set anything other than the common attributes
+    setsAttributes : bool
+        Whether or not the id, style, style class and language of the elements 
+        are set from the XML elements
+    hasSubelements : bool
+        Whether or not the elements have subelements. If not, the subelements 
+        of the XML elements are ignored.
+    """
+    def __init__(self, elementType, configure=None, setsAttributes=True, hasSubelements=True):
+        self.elementType = elementType
+        self.configure = configure
+        self.setsAttributes = setsAttributes
+        self.hasSubelements = hasSubelements
+
+    def __call__(self, importer, xmlElement):
+        e = self.elementType()
+
+        if self.configure != None:
+            self.configure(importer, e, xmlElement)
+
+        if self.setsAttributes:
+            e.id = xmlElement.getAttributeValue("id")
+            e.style = xmlElement.getAttributeValue("style")
+            e.styleClass = xmlElement.getAttributeValue("style-class")
+            e.language = importer._getAttributeValueOfSynonymousAttributes(xmlElement, ["l", "language"])
+
+        return e
+
+
+def _setPageElementFactories(importerType, pageElementFactories):
+    """
+    Sets the page element factories of an importer type in a process that 
+    imports sections in parallel, which may not have inherited them.
+    """
+    importerType._pageElementFactories = pageElementFactories
+
 
 class GImporter(object):
-    def __init__(self):
+    _xmlParserBackends = {
+        "python": XMLParser,
+        "expat": ExpatXMLParser,
+    }
+
+    def __init__(self, xmlDocumentCache=None):
 
         self.allowedDocumentVersions = ["0.1"]
 
+        # Parsed documents are kept here, unless importDocument is told not to 
+        # use the cache. By default, the cache is in the user's cache directory.
+        self.xmlDocumentCache = XMLDocumentCache() if xmlDocumentCache == None else xmlDocumentCache
+
     def _getAttributeValueOfSynonymousAttributes(self, element, attributeNames):
 
         value = ""
@@ -500,10 +1048,33 @@ class GImporter(object):
 
         return value
 
-    def importDocument(self, filePath):
-        xmlParser = XMLParser()
+    def importDocument(self, filePath, streaming=False, backend="python", parallel=False, maxWorkers=None, useCache=True):
+        """
+        Imports the Graph document file at the given path. If streaming is True, 
+        the file is parsed incrementally. If parallel is True, the sections are 
+        parsed and imported in separate processes, at most maxWorkers at a time; 
+        see importDocumentInParallel. Otherwise, the parsed document is taken 
+        from xmlDocumentCache if the file hasn't changed since it was last 
+        parsed, unless useCache is False.
+        """
+        if backend not in GImporter._xmlParserBackends:
+            raise ValueError("'{0}' is not a valid XML parser backend.".format(backend))
+
+        if streaming and parallel:
+            raise ValueError("A document can't be imported both streaming and in parallel.")
+
+        if parallel:
+            return self.importDocumentInParallel(filePath, backend, maxWorkers)
+
+        xmlParser = GImporter._xmlParserBackends[backend]()
 
-        root = xmlParser.parseFromFile(filePath).root
+        if streaming:
+            return self.importDocumentFromEvents(xmlParser.iterParseFromFile(filePath))
+
+        if useCache:
+            root = self.xmlDocumentCache.getDocument(filePath, xmlParser).root
+        else:
+            root = xmlParser.parseFromFile(filePath).root
 
         document = GDocument()
 
@@ -513,31 +1084,206 @@ class GImporter(object):
 
         return document
 
+    def importDocumentInParallel(self, filePath, backend="python", maxWorkers=None, mpContext=None):
+        """
+        Imports the Graph document file at the given path, parsing and importing 
+        its sections in a pool of processes. The sections are independent, so 
+        the text of each top-level <section> is found with a quick scan of the 
+        file, without parsing it, and handed to another process. The rest of 
+        the document, with the content of <sections> blanked out, is parsed 
+        and imported here. The sections are put back in order as they're done.
+
+        The processes are started with the given multiprocessing context, or 
+        the default one. They're given the page element factories registered 
+        here, so when processes are spawned rather than forked, the factories 
+        of any types registered at runtime must be picklable.
+        """
+        with open(filePath, "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        xmlParser = GImporter._xmlParserBackends[backend]()
+        sectionSpans = self._findSectionSpans(text)
+
+        if sectionSpans == None:
+            root = xmlParser.parseDocument(text).root
+
+            document = GDocument()
+
+            self._importMetadata(root, document)
+            self._importTemplates(root, document)
+            self._importSections(root, document)
+
+            return document
+
+        contentStart, contentEnd, spans = sectionSpans
+
+        # The content of <sections> is replaced with just its line breaks, and 
+        # the indentation of its closing tag, so that the lines and columns of 
+        # everything after it stay the same.
+        content = text[contentStart:contentEnd]
+        blank = content.count("\n") * "\n" + (len(content) - content.rfind("\n") - 1) * " "
+
+        try:
+            root = xmlParser.parseDocument(text[:contentStart] + blank + text[contentEnd:]).root
+        except XMLParsingError as e:
+            if e.position != None and e.position >= contentStart + len(blank):
+                e.position += len(content) - len(blank)
+
+            raise
+
+        document = GDocument()
+
+        self._importMetadata(root, document)
+        self._importTemplates(root, document)
+
+        if len(spans) == 0:
+            return document
+
+        sectionTexts = [text[a:b] for a, b in spans]
+        backends = [backend] * len(spans)
+
+        # The sections are handed out one at a time, so that an error can be 
+        # traced back to the section it came from.
+        with ProcessPoolExecutor(maxWorkers, mpContext, _setPageElementFactories, (type(self), type(self)._pageElementFactories)) as executor:
+            sections = executor.map(self._importSectionFromText, sectionTexts, backends)
+
+            try:
+                for s in sections:
+                    s.document = document
+
+                    document.sections.append(s)
+            except (XMLParsingError, GraphValidationError) as e:
+                self._locateSectionError(e, text, spans[len(document.sections)][0])
+                raise
+
+        return document
+
+    # Each section is parsed as a document of its own, and starts on the 
+    # second line of it.
+    _sectionDeclaration = "<?xml version=\"1.0\" encoding=\"UTF-8\" ?>\n"
+
+    _sectionTagPattern = re.compile(r"<(/?)(sections|section)(?=[\s/>])[^>]*>")
+
+    def _findSectionSpans(self, text):
+        """
+        Finds the start and end of the content of the <sections> element in 
+        the given text, and the start and end of each <section> element in it, 
+        by matching their tags. Returns None if there is no <sections> element 
+        with content.
+        """
+        spans = []
+        contentStart = None
+        depth = 0
+        start = 0
+
+        for m in GImporter._sectionTagPattern.finditer(text):
+            isClosingTag = m.group(1) == "/"
+            isSelfClosingTag = m.group().endswith("/>")
+
+            if m.group(2) == "sections":
+                if contentStart == None and not isClosingTag and not isSelfClosingTag:
+                    contentStart = m.end()
+                elif contentStart != None and isClosingTag and depth == 0:
+                    return (contentStart, m.start(), spans)
+            elif contentStart != None:
+                if isClosingTag:
+                    depth -= 1
+
+                    if depth == 0:
+                        spans.append((start, m.end()))
+                elif isSelfClosingTag:
+                    if depth == 0:
+                        spans.append((m.start(), m.end()))
+                else:
+                    if depth == 0:
+                        start = m.start()
+
+                    depth += 1
+
+        return None
+
+    def _importSectionFromText(self, text, backend):
+        xmlParser = GImporter._xmlParserBackends[backend]()
+        section = xmlParser.parseDocument(GImporter._sectionDeclaration + text).root
+
+        s = self._getSectionFromXML(section, None)
+
+        s.subelements = self._getPageElementsFromXML(section.subelements)
+
+        return s
+
+    def _locateSectionError(self, e, text, start):
+        """
+        Moves the location of an error in the text of a section, which was 
+        parsed on its own, to its location in the whole document.
+        """
+        n = len(GImporter._sectionDeclaration)
+
+        if isinstance(e, XMLParsingError) and e.position != None:
+            e.position += start - n
+
+        if e.line != None:
+            line, column = XMLSourceLocator(text).getLineAndColumn(start)
+
+            if e.line == 2:
+                e.column += column - 1
+
+            e.line += line - 2
+
+    def importDocumentFromEvents(self, events):
+        """
+        Imports a Graph document from a sequence of XML parsing events, such as those 
+        from XMLParser.iterParse. The metadata and templates are built into small XML 
+        trees and imported as usual, but the content of each section is converted 
+        straight into Graph elements, so the XML tree for it is never built.
+        """
+        xmlParser = XMLParser()
+        events = iter(events)
+
+        document = GDocument()
+        root = None
+
+        for event, e in events:
+            if event != "start":
+                continue
+
+            if root == None:
+                root = e
+            elif e.name == "sections":
+                self._importSectionsFromEvents(e, events, document)
+            else:
+                root.subelements.append(xmlParser.buildElementFromEvents(e, events))
+
+        self._importMetadata(root, document)
+        self._importTemplates(root, document)
+
+        return document
+
     def _importMetadata(self, root, document):
 
         if root.name != "document":
-            raise GraphValidationError("The root element in a Graph document file must be a <document> element.")
+            raise GraphValidationError("The root element in a Graph document file must be a <document> element.", root)
 
         if not root.hasAttribute("version"):
-            raise GraphValidationError("The <document> element must have a 'version' attribute.")
+            raise GraphValidationError("The <document> element must have a 'version' attribute.", root)
 
         version = root.getAttributeValue("version")
 
         if version not in self.allowedDocumentVersions:
-            raise GraphValidationError("'{0}' is not a valid Graph version.".format(version))
+            raise GraphValidationError("'{0}' is not a valid Graph version.".format(version), root)
 
         document.version = version
 
-        title = root.getFirstElementWithName("title")
-        subtitle = root.getFirstElementWithName("subtitle")
-        abstract = root.getFirstElementWithName("abstract")
-        keywords = root.getFirstElementWithName("keywords")
-        draft = root.getFirstElementWithName("draft")
-        edition = root.getFirstElementWithName("edition")
-        isbn = root.getFirstElementWithName("isbn")
+        title = root.findFirst("title")
+        subtitle = root.findFirst("subtitle")
+        abstract = root.findFirst("abstract")
+        keywords = root.findFirst("keywords")
+        draft = root.findFirst("draft")
+        edition = root.findFirst("edition")
+        isbn = root.findFirst("isbn")
 
         if title == None:
-            raise GraphValidationError("A Graph document must have a title.")
+            raise GraphValidationError("A Graph document must have a title.", root)
 
         document.title = title.innerText.strip()
 
@@ -559,7 +1305,7 @@ class GImporter(object):
         if isbn != None:
             document.isbn = isbn.innerText.strip()
 
-        contributors = root.getFirstElementWithName("contributors").getElementsByName("contributor")
+        contributors = root.findFirst("contributors").iterElementsByName("contributor")
 
         for contributor in contributors:
             c = GContributor()
@@ -570,12 +1316,12 @@ class GImporter(object):
                 if t.lower() in ["author", "editor"]:
                     c.type = t.lower()
                 else:
-                    raise GraphValidationError("'{0}' is not a valid Graph contributor type.".format(t))
+                    raise GraphValidationError("'{0}' is not a valid Graph contributor type.".format(t), contributor)
 
-            name = contributor.getFirstElementWithName("name")
-            emailAddress = contributor.getFirstElementWithName("email-address")
-            address = contributor.getFirstElementWithName("address")
-            website = contributor.getFirstElementWithName("website")
+            name = contributor.findFirst("name")
+            emailAddress = contributor.findFirst("email-address")
+            address = contributor.findFirst("address")
+            website = contributor.findFirst("website")
 
             if name != None:
                 c.name = name.innerText.strip()
@@ -593,16 +1339,16 @@ class GImporter(object):
 
     def _importTemplates(self, root, document):
 
-        templates = root.getFirstElementWithName("templates", False)
-        pageTemplates = templates.getElementsByName("page-template", False)
+        templates = root.findFirst("templates", False)
+        pageTemplates = templates.iterElementsByName("page-template", False)
 
         for pageTemplate in pageTemplates:
             pt = GPageTemplate()
 
             pt.reference = self._getAttributeValueOfSynonymousAttributes(pageTemplate, ["r", "reference"])
 
-            header = pageTemplate.getFirstElementWithName("header", False)
-            footer = pageTemplate.getFirstElementWithName("footer", False)
+            header = pageTemplate.findFirst("header", False)
+            footer = pageTemplate.findFirst("footer", False)
 
             if header != None:
                 h = GHeader()
@@ -622,101 +1368,200 @@ class GImporter(object):
 
     def _importSections(self, root, document):
 
-        sections = root.getFirstElementWithName("sections", False).getElementsByName("section", False)
+        sections = root.findFirst("sections", False).iterElementsByName("section", False)
 
         for section in sections:
-            s = GSection()
-
-            s.document = document
-
-            s.id = section.getAttributeValue("id")
-            s.style = section.getAttributeValue("style")
-            s.styleClass = section.getAttributeValue("style-class")
-            s.language = self._getAttributeValueOfSynonymousAttributes(section, ["l", "language"])
-            s.pageTemplateReference = self._getAttributeValueOfSynonymousAttributes(section, ["ptr", "page-template-reference"])
-            s.exclude = True if  section.getAttributeValue("exclude") == "yes" else False
+            s = self._getSectionFromXML(section, document)
 
             s.subelements = self._getPageElementsFromXML(section.subelements)
 
             document.sections.append(s)
 
+    def _importSectionsFromEvents(self, sections, events, document):
+
+        for event, e in events:
+            if event == "end" and e is sections:
+                break
+
+            if event == "start" and e.superelement is sections and e.name == "section":
+                s = self._getSectionFromXML(e, document)
+
+                s.subelements = self._getPageElementsFromEvents(e, events)
+
+                document.sections.append(s)
+
+    def _getSectionFromXML(self, section, document):
+        s = GSection()
+
+        s.document = document
+
+        s.id = section.getAttributeValue("id")
+        s.style = section.getAttributeValue("style")
+        s.styleClass = section.getAttributeValue("style-class")
+        s.language = self._getAttributeValueOfSynonymousAttributes(section, ["l", "language"])
+        s.pageTemplateReference = self._getAttributeValueOfSynonymousAttributes(section, ["ptr", "page-template-reference"])
+        s.exclude = True if  section.getAttributeValue("exclude") == "yes" else False
+
+        return s
+
     def _getPageElementsFromXML(self, xmlElements):
-        return [self._getPageElementFromXML(e) for e in xmlElements]
+        """
+        Converts the given XML elements, and everything in them, into Graph elements 
+        in a single pass. The XML trees are walked with an explicit stack rather than 
+        by recursion, so the depth of nesting isn't limited by Python's recursion 
+        limit, and the white space at the start and end of block elements is trimmed 
+        as their text elements are made.
+        """
+        pageElements = []
+
+        # Each entry is an iterator over the XML subelements of an element that are 
+        # still to be converted, the list of Graph subelements that they go into, the 
+        # number of XML subelements, and whether or not their white space is trimmed.
+        openElements = [(enumerate(xmlElements), pageElements, len(xmlElements), False)]
+
+        while len(openElements) > 0:
+            xmlSubelements, subelements, n, trimsWhiteSpace = openElements[-1]
+
+            for i, x in xmlSubelements:
+                if isinstance(x, XMLTextElement):
+                    t = x.text
+
+                    if trimsWhiteSpace:
+                        if i == 0:
+                            t = t.lstrip()
+                        if i == n - 1:
+                            t = t.rstrip()
+
+                    subelements.append(GTextElement(t))
+                else:
+                    e = self._createPageElementFromXML(x)
 
-    def _getPageElementFromXML(self, xmlElement):
+                    subelements.append(e)
+
+                    if self._canHaveSubelements(x):
+                        e.subelements = []
+
+                        openElements.append((enumerate(x.subelements), e.subelements, len(x.subelements), isinstance(e, GImporter._whiteSpaceTrimmingTypes)))
+                        break
+            else:
+                openElements.pop()
+
+        return pageElements
+
+    def _getPageElementsFromEvents(self, xmlElement, events):
+        """
+        Consumes the events that follow the start event of the given XML element, up to 
+        and including its end event, and returns the Graph elements that they describe.
+        """
+        subelements = []
+
+        # Each entry is an open XML element, the Graph element made from it, and the 
+        # list of Graph subelements collected for it so far.
+        openElements = [(xmlElement, None, subelements)]
+
+        for event, e in events:
+            if event == "text":
+                openElements[-1][2].append(GTextElement(e.text))
+            elif event == "start":
+                pe = self._createPageElementFromXML(e)
+
+                openElements[-1][2].append(pe)
+                openElements.append((e, pe, []))
+            elif event == "end":
+                x, pe, pageSubelements = openElements.pop()
 
-        if isinstance(xmlElement, XMLTextElement):
-            return GTextElement(xmlElement.text)
-
-        if xmlElement.name in GPageBreak._elementNames:
-            return GPageBreak()
-        if xmlElement.name in GLineBreak._elementNames:
-            return GLineBreak()
-        if xmlElement.name in GHorizontalRule._elementNames:
-            return GHorizontalRule()
-
-        e = None
-
-        if xmlElement.name in GHeading._elementNames:
-            e = GHeading()
-            i = GHeading._elementNames.index(xmlElement.name)
-            e.level = GHeading._levels[i]
-        if xmlElement.name in GParagraph._elementNames:
-            e = GParagraph()
-        if xmlElement.name in GDivision._elementNames:
-            e = GDivision()
-        if xmlElement.name in GBold._elementNames:
-            e = GBold()
-        if xmlElement.name in GItalic._elementNames:
-            e = GItalic()
-        if xmlElement.name in GUnderline._elementNames:
-            e = GUnderline()
-        if xmlElement.name in GStrikethrough._elementNames:
-            e = GStrikethrough()
-        if xmlElement.name in GOrderedList._elementNames:
-            e = GOrderedList()
-        if xmlElement.name in GUnorderedList._elementNames:
-            e = GUnorderedList()
-        if xmlElement.name in GListItem._elementNames:
-            e = GListItem()
-        if xmlElement.name in GDefinitionList._elementNames:
-            e = GDefinitionList()
-        if xmlElement.name in GDefinitionListTerm._elementNames:
-            e = GDefinitionListTerm()
-        if xmlElement.name in GDefinitionListDefinition._elementNames:
-            e = GDefinitionListDefinition()
-        if xmlElement.name in GTable._elementNames:
-            e = GTable()
-        if xmlElement.name in GTableRow._elementNames:
-            e = GTableRow()
-        if xmlElement.name in GTableData._elementNames:
-            e = GTableData()
-        if xmlElement.name in GHyperlink._elementNames:
-            e = GHyperlink()
-            e.url = xmlElement.getAttributeValue("url")
-            e.title = xmlElement.getAttributeValue("title")
-        if xmlElement.name in GVariable._elementNames:
-            e = GVariable()
-            e.name = xmlElement.getAttributeValue("name")
-        if xmlElement.name in GPageNumber._elementNames:
-            e = GPageNumber()
-        if xmlElement.name in GTableOfContents._elementNames:
-            e = GTableOfContents()
-        if xmlElement.name in GCitation._elementNames:
-            e = GCitation()
-            e.reference = self._getAttributeValueOfSynonymousAttributes(xmlElement, ["r", "reference"])
-
-        if e == None:
-            raise GraphValidationError("<{0}> is not a valid element type.".format(xmlElement.name))
-
-        e.id = xmlElement.getAttributeValue("id")
-        e.style = xmlElement.getAttributeValue("style")
-        e.styleClass = xmlElement.getAttributeValue("style-class")
-        e.language = self._getAttributeValueOfSynonymousAttributes(xmlElement, ["l", "language"])
-
-        e.subelements = self._getPageElementsFromXML(xmlElement.subelements)
-
-        if (isinstance(e, GParagraph) or isinstance(e, GHeading) or isinstance(e, GDivision) or isinstance(e, GListItem) or isinstance(e, GDefinitionListTerm) or isinstance(e, GDefinitionListDefinition)) and len(e.subelements) > 0:
+                if pe == None:
+                    break
+
+                if self._canHaveSubelements(x):
+                    pe.subelements = pageSubelements
+
+                    self._trimWhiteSpace(pe)
+
+        return subelements
+
+    def _getPageElementFromXML(self, xmlElement):
+        return self._getPageElementsFromXML([xmlElement])[0]
+
+    def _canHaveSubelements(self, xmlElement):
+        """
+        Returns whether or not the Graph element for the given XML element has 
+        subelements. Factories that don't say are taken to make elements that do.
+        """
+        factory = self._pageElementFactories.get(xmlElement.name)
+
+        return getattr(factory, "hasSubelements", True)
+
+    def _createPageElementFromXML(self, xmlElement):
+        """
+        Creates the Graph element for the given XML element, and sets its attributes, 
+        but not its subelements.
+        """
+        factory = self._pageElementFactories.get(xmlElement.name)
+
+        if factory == None:
+            raise GraphValidationError("<{0}> is not a valid element type.".format(xmlElement.name), xmlElement)
+
+        return factory(self, xmlElement)
+
+    # Maps the name of each XML element that can be in the content of a section 
+    # or a template to a function that makes the Graph element for it, which is 
+    # called with the importer and the XML element.
+    _pageElementFactories = {}
+
+    @classmethod
+    def registerPageElementFactory(cls, elementNames, factory):
+        """
+        Registers a function that makes the Graph elements for the XML elements 
+        with the given names. The function is called with the importer and the 
+        XML element, and returns a new Graph element without its subelements. 
+        Registering with a subclass of GImporter gives it a copy of the 
+        factories of its base class, so the base class isn't changed.
+        """
+        if "_pageElementFactories" not in cls.__dict__:
+            cls._pageElementFactories = dict(cls._pageElementFactories)
+
+        for name in elementNames:
+            cls._pageElementFactories[name] = factory
+
+    @classmethod
+    def registerPageElementType(cls, elementType, configure=None, elementNames=None, hasSubelements=True):
+        """
+        Registers a type of Graph element, so that the XML elements with the 
+        given names, or with the names in elementType._elementNames, are 
+        imported as elements of that type. Each element is made by calling 
+        elementType with no arguments, and its id, style, style class and 
+        language are set from the XML element. If configure is given, it is 
+        then called with the importer, the element and the XML element, to set 
+        anything else. If hasSubelements is False, the subelements of the XML 
+        elements are ignored.
+        """
+        factory = _PageElementFactory(elementType, configure, hasSubelements=hasSubelements)
+
+        cls.registerPageElementFactory(elementType._elementNames if elementNames == None else elementNames, factory)
+
+    def _configureHeading(self, e, xmlElement):
+        e.level = GHeading._levelsByElementName[xmlElement.name]
+
+    def _configureHyperlink(self, e, xmlElement):
+        e.url = xmlElement.getAttributeValue("url")
+        e.title = xmlElement.getAttributeValue("title")
+
+    def _configureVariable(self, e, xmlElement):
+        e.name = xmlElement.getAttributeValue("name")
+
+    def _configureCitation(self, e, xmlElement):
+        e.reference = self._getAttributeValueOfSynonymousAttributes(xmlElement, ["r", "reference"])
+
+    # The block elements, whose content has the white space at its start and end 
+    # removed.
+    _whiteSpaceTrimmingTypes = (GParagraph, GHeading, GDivision, GListItem, GDefinitionListTerm, GDefinitionListDefinition)
+
+    def _trimWhiteSpace(self, e):
+        """
+        Removes the white space at the start and end of the content of block elements.
+        """
+        if isinstance(e, GImporter._whiteSpaceTrimmingTypes) and len(e.subelements) > 0:
             fse = e.subelements[0]
             lse = e.subelements[-1]
 
@@ -726,16 +1571,48 @@ class GImporter(object):
             if isinstance(lse, GTextElement):
                 lse.text = lse.text.rstrip()
 
-        return e
+
+# Breaks have no attributes or subelements, so they're made without any.
+GImporter.registerPageElementFactory(GPageBreak._elementNames, _PageElementFactory(GPageBreak, setsAttributes=False, hasSubelements=False))
+GImporter.registerPageElementFactory(GLineBreak._elementNames, _PageElementFactory(GLineBreak, setsAttributes=False, hasSubelements=False))
+GImporter.registerPageElementFactory(GHorizontalRule._elementNames, _PageElementFactory(GHorizontalRule, setsAttributes=False, hasSubelements=False))
+
+GImporter.registerPageElementType(GHeading, GImporter._configureHeading)
+GImporter.registerPageElementType(GParagraph)
+GImporter.registerPageElementType(GDivision)
+GImporter.registerPageElementType(GBold)
+GImporter.registerPageElementType(GItalic)
+GImporter.registerPageElementType(GUnderline)
+GImporter.registerPageElementType(GStrikethrough)
+GImporter.registerPageElementType(GOrderedList)
+GImporter.registerPageElementType(GUnorderedList)
+GImporter.registerPageElementType(GListItem)
+GImporter.registerPageElementType(GDefinitionList)
+GImporter.registerPageElementType(GDefinitionListTerm)
+GImporter.registerPageElementType(GDefinitionListDefinition)
+GImporter.registerPageElementType(GTable)
+GImporter.registerPageElementType(GTableRow)
+GImporter.registerPageElementType(GTableData)
+GImporter.registerPageElementType(GHyperlink, GImporter._configureHyperlink)
+GImporter.registerPageElementType(GVariable, GImporter._configureVariable)
+GImporter.registerPageElementType(GPageNumber)
+GImporter.registerPageElementType(GTableOfContents)
+GImporter.registerPageElementType(GCitation, GImporter._configureCitation)
 
 
 class StyleResolver(object):
     def linearise(self, elements):
-        e = elements.copy()
+        e = []
 
-        for element in elements:
-            if isinstance(element, GContentElement):
-                e = e + self.linearise(element.subelements)
+        # A list of elements is followed by the linearised subelements of each of 
+        # them in turn, so the lists still to be added are kept on a stack with 
+        # the first of them on top.
+        lists = [elements]
+
+        while len(lists) > 0:
+            l = lists.pop()
+            e.extend(l)
+            lists.extend(reversed([element.subelements for element in l if isinstance(element, GContentElement)]))
 
         return e
 
@@ -824,16 +1701,25 @@ class StyleResolver(object):
         else:
             e.styleProperties[p.name] = p.value
 
-    def applyStyleRuleToDocument(self, styleRule, document):
-
-        sections = document.sections
-        templates = document.templates
-
-        allElements = self.linearise(sections) + self.linearise(templates)
-
-        while len(styleRule.selectors) > 0:
-            selector = styleRule.selectors.pop(0)
-
+    def applyStyleRuleToDocument(self, styleRule, document, allElements=None):
+        """
+        Applies a Morph style rule to the elements of a Graph document that it 
+        selects.
+
+        Parameters
+        ----------
+        styleRule : MStyleRule
+            The style rule
+        document : GDocument
+            The document
+        allElements : list of GTextElement and GContentElement
+            The linearised elements of the sections and templates of the document, 
+            or None to linearise them here
+        """
+        if allElements == None:
+            allElements = self.linearise(document.sections) + self.linearise(document.templates)
+
+        for selector in styleRule.selectors:
             if isinstance(selector, MElementNameSelector):
                 allElements = self.selectElementsByName(allElements, selector.elementName)
                 continue
@@ -857,12 +1743,15 @@ class StyleResolver(object):
                 self.applyStylePropertyToElement(p, 1, e)
 
     def applyMorphDocumentToGraphDocument(self, morphDocument, graphDocument):
-        for styleRule in morphDocument.styleRules:
-            self.applyStyleRuleToDocument(styleRule, graphDocument)
+        # Style rules only change style properties, so the document is linearised 
+        # once for all of them.
+        sectionElements = self.linearise(graphDocument.sections)
+        allElements = sectionElements + self.linearise(graphDocument.templates)
 
-        allElements = self.linearise(graphDocument.sections)
+        for styleRule in morphDocument.styleRules:
+            self.applyStyleRuleToDocument(styleRule, graphDocument, allElements)
 
-        for element in allElements:
+        for element in sectionElements:
             if isinstance(element, GContentElement):
                 styleProperties = importMorphProperties(element.style)
 
@@ -873,10 +1762,14 @@ class StyleResolver(object):
             self.cascadeToSubelements(section)
 
     def cascadeToSubelements(self, element):
+        styleProperties = element.styleProperties
+
         for subelement in element.subelements:
-            for spn in element.styleProperties:
-                if spn in subelement.styleProperties and subelement.styleProperties[spn] == "inherit":
-                    subelement.styleProperties[spn] = element.styleProperties[spn]
+            subelementStyleProperties = subelement.styleProperties
+
+            for spn in styleProperties:
+                if spn in subelementStyleProperties and subelementStyleProperties[spn] == "inherit":
+                    subelementStyleProperties[spn] = styleProperties[spn]
 
             if isinstance(subelement, GContentElement):
                 self.cascadeToSubelements(subelement)
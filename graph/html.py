@@ -52,9 +52,7 @@ class HTMLExporter(object):
 
             xmlExporter = XMLExporter()
 
-            t = xmlExporter.exportDocument(htmlDocument)
-
-            fileObject.write(t)
+            xmlExporter.writeDocument(htmlDocument, fileObject)
 
     def exportSection(self, section, document, htmlElement, htmlDocument):
         s = XMLElement("section")
@@ -63,8 +61,15 @@ class HTMLExporter(object):
         htmlElement.subelements.append(s)
 
     def exportElements(self, elements, document, htmlElement, htmlDocument):
-        for element in elements:
-            self.exportElement(element, document, htmlElement, htmlDocument)
+        if isinstance(elements, GTextRuns):
+            for element in elements.iterTextsAndElements():
+                if isinstance(element, str):
+                    htmlElement.subelements.append(XMLTextElement(element))
+                else:
+                    self.exportElement(element, document, htmlElement, htmlDocument)
+        else:
+            for element in elements:
+                self.exportElement(element, document, htmlElement, htmlDocument)
             
     def exportElement(self, element, document, htmlElement, htmlDocument):
         if isinstance(element, GParagraph):
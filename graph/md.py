@@ -16,8 +16,15 @@ class MarkdownExporter(object):
         self.exportElements(section.subelements, document, fileObject)
 
     def exportElements(self, elements, document, fileObject, allowLineBreaks = True):
-        for element in elements:
-            self.exportElement(element, document, fileObject, allowLineBreaks)
+        if isinstance(elements, GTextRuns):
+            for element in elements.iterTextsAndElements():
+                if isinstance(element, str):
+                    fileObject.write(element)
+                else:
+                    self.exportElement(element, document, fileObject, allowLineBreaks)
+        else:
+            for element in elements:
+                self.exportElement(element, document, fileObject, allowLineBreaks)
     
     def exportElement(self, element, document, fileObject, allowLineBreaks = True):
         if isinstance(element, GTextElement):
@@ -14,8 +14,15 @@ class TextExporter(object):
         self.exportElements(section.subelements, document, fileObject)
 
     def exportElements(self, elements, document, fileObject, allowLineBreaks = True, indentation = 0):
-        for element in elements:
-            self.exportElement(element, document, fileObject, allowLineBreaks, indentation)
+        if isinstance(elements, GTextRuns):
+            for element in elements.iterTextsAndElements():
+                if isinstance(element, str):
+                    fileObject.write(element)
+                else:
+                    self.exportElement(element, document, fileObject, allowLineBreaks, indentation)
+        else:
+            for element in elements:
+                self.exportElement(element, document, fileObject, allowLineBreaks, indentation)
     
     def exportElement(self, element, document, fileObject, allowLineBreaks = True, indentation = 0):
         if isinstance(element, GTextElement):
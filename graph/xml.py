@@ -1,4 +1,12 @@
+import hashlib
+import io
+import marshal
+import mmap
+import os
 import re
+import tempfile
+from bisect import bisect_right
+from xml.parsers import expat
 
 
 class XMLDocument(object):
@@ -9,8 +17,11 @@ class XMLDocument(object):
     ----------
     declaration : XMLDeclaration
         An XML declaration object
-    root : XMLElement
-        An XML element that is the root element of this document
+    root : XMLElement, optional
+        An XML element that is the root element of this document. If this 
+        is omitted, the root must be attached later by whatever creates the 
+        document, such as the XML parser, along with the relational 
+        properties of each element.
 
     Attributes
     ----------
@@ -19,16 +30,59 @@ class XMLDocument(object):
     root : XMLElement
         This document's root element
     """
-    def __init__(self, declaration, root):
+    def __init__(self, declaration, root=None):
         self.declaration = declaration
+
+        # Finds the lines and columns of the source positions of the elements, 
+        # if this document was parsed from text.
+        self.sourceLocator = None
+
+        self._root = None
+        self._elementIndex = None
+        self._numberOfQueries = 0
+
         self.root = root
 
-        self.root.document = self
+        if self.root != None:
+            self.root.document = self
+
+            # Calling the setDepth function here results in iterating over 
+            # all of the elements in the document and sets their relational 
+            # properties.
+            self.root._setDepth()
+
+    @property
+    def root(self):
+        return self._root
+
+    @root.setter
+    def root(self, value):
+        self._root = value
+        self._invalidateElementIndex()
 
-        # Calling the setDepth function here results in iterating over 
-        # all of the elements in the document and sets their relational 
-        # properties.
-        self.root._setDepth()
+    # Building the index walks the whole document, which costs more than the 
+    # few lookups that most documents get, since those stop at their first 
+    # match. So it's only built once the document has been queried this many 
+    # times since it last changed.
+    _numberOfQueriesBeforeIndexing = 16
+
+    def _getElementIndex(self):
+        """
+        Gets the index of the elements in this document by name, or None if it 
+        hasn't been queried often enough since it last changed for it to be 
+        worth building.
+        """
+        if self._elementIndex == None and self._root != None:
+            self._numberOfQueries += 1
+
+            if self._numberOfQueries > XMLDocument._numberOfQueriesBeforeIndexing:
+                self._elementIndex = XMLElementIndex(self._root)
+
+        return self._elementIndex
+
+    def _invalidateElementIndex(self):
+        self._elementIndex = None
+        self._numberOfQueries = 0
 
 
 class XMLAttribute(object):
@@ -49,6 +103,8 @@ class XMLAttribute(object):
     value : str
         The value of this attribute
     """
+    __slots__ = ("name", "value")
+
     def __init__(self, name, value):
         self.name = name
         self.value = value
@@ -120,7 +176,227 @@ class HTML5Declaration(object):
     pass
 
 
+def _makeNodeList(listType, owner, items):
+    """
+    Remakes a pickled or copied XMLNodeList. The items already have their 
+    relational properties, so the owner isn't told about them.
+    """
+    nodeList = listType.__new__(listType)
+    list.extend(nodeList, items)
+    nodeList.owner = owner
+
+    return nodeList
+
+
+class XMLNodeList(list):
+    """
+    A list of the subelements or attributes of an XML element, which tells the 
+    element whenever it is changed, so that the element can invalidate anything 
+    that it has worked out from the list.
+
+    Parameters
+    ----------
+    owner : XMLElement
+        The element that this list belongs to
+    items : iterable, optional
+        The initial items of this list
+    """
+    __slots__ = ("owner",)
+
+    def __init__(self, owner, items=()):
+        super(XMLNodeList, self).__init__(items)
+
+        self.owner = owner
+
+    def __reduce_ex__(self, protocol):
+        return (_makeNodeList, (type(self), self.owner, list(self)))
+
+    def _added(self, items):
+        pass
+
+    def _changed(self):
+        pass
+
+    def append(self, item):
+        super(XMLNodeList, self).append(item)
+        self._added((item,))
+        self._changed()
+
+    def extend(self, items):
+        items = list(items)
+        super(XMLNodeList, self).extend(items)
+        self._added(items)
+        self._changed()
+
+    def insert(self, i, item):
+        super(XMLNodeList, self).insert(i, item)
+        self._added((item,))
+        self._changed()
+
+    def remove(self, item):
+        super(XMLNodeList, self).remove(item)
+        self._changed()
+
+    def pop(self, i=-1):
+        item = super(XMLNodeList, self).pop(i)
+        self._changed()
+        return item
+
+    def clear(self):
+        super(XMLNodeList, self).clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super(XMLNodeList, self).sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super(XMLNodeList, self).reverse()
+        self._changed()
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            value = list(value)
+            self._added(value)
+        else:
+            self._added((value,))
+
+        super(XMLNodeList, self).__setitem__(i, value)
+        self._changed()
+
+    def __delitem__(self, i):
+        super(XMLNodeList, self).__delitem__(i)
+        self._changed()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, n):
+        super(XMLNodeList, self).__imul__(n)
+        self._changed()
+        return self
+
+
+class XMLSubelementList(XMLNodeList):
+    __slots__ = ()
+
+    def _added(self, items):
+        for item in items:
+            item.superelement = self.owner
+
+    def _changed(self):
+        self.owner._subelementsChanged()
+
+
+class XMLAttributeList(XMLNodeList):
+    __slots__ = ()
+
+    def _changed(self):
+        self.owner._attributesChanged()
+
+
+class XMLElementIndex(object):
+    """
+    An index of the elements under a root element by name, in document order. 
+    Each indexed element is given its position in document order, and the 
+    position of its last descendant, so the elements with a given name under 
+    any element can be found by bisection.
+
+    Parameters
+    ----------
+    root : XMLElement
+        The element to index the descendants of
+    """
+    def __init__(self, root):
+        self.elementsByName = {}
+        self.positionsByName = {}
+
+        elements = []
+        stack = [root]
+
+        while len(stack) > 0:
+            e = stack.pop()
+
+            elements.append(e)
+            stack.extend([s for s in reversed(e.subelements) if isinstance(s, XMLElement)])
+
+        # The descendants of an element come straight after it in document order, so 
+        # working backwards means the last subelement of an element has always been 
+        # given its range before the element itself.
+        for i in range(len(elements) - 1, -1, -1):
+            e = elements[i]
+            end = i
+
+            for s in reversed(e.subelements):
+                if isinstance(s, XMLElement):
+                    end = s._indexEntry[2]
+                    break
+
+            e._indexEntry = (self, i, end)
+
+        for i, e in enumerate(elements):
+            if e.name in self.elementsByName:
+                self.elementsByName[e.name].append(e)
+                self.positionsByName[e.name].append(i)
+            else:
+                self.elementsByName[e.name] = [e]
+                self.positionsByName[e.name] = [i]
+
+    def _getRange(self, element, name):
+        positions = self.positionsByName.get(name)
+
+        if positions == None:
+            return (0, 0)
+
+        a = bisect_right(positions, element._indexEntry[1])
+        b = bisect_right(positions, element._indexEntry[2])
+
+        return (a, b)
+
+    def getElementsByName(self, element, name):
+        """
+        Gets the elements with the given name under the given element, in document order.
+        """
+        a, b = self._getRange(element, name)
+
+        return self.elementsByName[name][a:b] if b > a else []
+
+    def getFirstElementWithName(self, element, name):
+        a, b = self._getRange(element, name)
+
+        return self.elementsByName[name][a] if b > a else None
+
+
+def _makeFlagProperty(flag):
+    """
+    Makes a property for one of the bits in the _flags attribute of an XMLElement.
+    """
+    def getFlag(self):
+        return self._flags & flag != 0
+
+    def setFlag(self, value):
+        if value:
+            self._flags |= flag
+        else:
+            self._flags &= ~flag
+
+    return property(getFlag, setFlag)
+
+
 class XMLElement(object):
+    # The self-closing and line break settings only matter when exporting, so 
+    # they're packed into the bits of a single small integer rather than each 
+    # taking a slot of their own.
+    _isSelfClosingFlag = 1
+    _lineBreakBeforeOpeningTagFlag = 2
+    _lineBreakAfterOpeningTagFlag = 4
+    _lineBreakBeforeClosingTagFlag = 8
+    _lineBreakAfterClosingTagFlag = 16
+    _defaultFlags = 2 | 4 | 8
+
+    __slots__ = ("document", "root", "superelement", "depth", "name", "sourceStart", "sourceEnd", "_sourceLocation", "_attributes", "_attributeIndex", "_subelements", "_indexEntry", "_innerText", "_flags")
+
     def __init__(self, name):
         self.document = None
         self.root = None
@@ -129,30 +405,127 @@ class XMLElement(object):
         self.depth = 0
 
         self.name = name
-        self.attributes = []
-        self.subelements = []
 
-        self.isSelfClosing = False
+        # The offsets of the start of the opening tag and the end of the 
+        # closing tag in the text this element was parsed from, if any.
+        self.sourceStart = None
+        self.sourceEnd = None
+        self._sourceLocation = None
+
+        self._attributes = XMLAttributeList(self)
+        self._attributeIndex = None
+        self._subelements = XMLSubelementList(self)
+        self._indexEntry = None
+        self._innerText = None
+
+        self._flags = XMLElement._defaultFlags
 
-        self.lineBreakBeforeOpeningTag = True
-        self.lineBreakAfterOpeningTag = True
-        self.lineBreakBeforeClosingTag = True
-        self.lineBreakAfterClosingTag = False
+    isSelfClosing = _makeFlagProperty(_isSelfClosingFlag)
+    lineBreakBeforeOpeningTag = _makeFlagProperty(_lineBreakBeforeOpeningTagFlag)
+    lineBreakAfterOpeningTag = _makeFlagProperty(_lineBreakAfterOpeningTagFlag)
+    lineBreakBeforeClosingTag = _makeFlagProperty(_lineBreakBeforeClosingTagFlag)
+    lineBreakAfterClosingTag = _makeFlagProperty(_lineBreakAfterClosingTagFlag)
+
+    def getSourceLocation(self):
+        """
+        Returns the line and column, counting from 1, at which this element 
+        starts in the text it was parsed from, or None if that is not known.
+        """
+        return _getSourceLocation(self)
 
     def _setDepth(self, depth=0):
         self.depth = depth
 
-        for e in self.subelements:
-            e._setDepth(depth + 1)
+        root = self if self.root == None else self.root
+        elements = [self]
 
-            e.document = self.document
+        while len(elements) > 0:
+            element = elements.pop()
 
-            if self.root == None:
-                e.root = self
-            else:
-                e.root = self.root
+            for e in element.subelements:
+                e.superelement = element
+
+                if isinstance(e, XMLElement):
+                    e.depth = element.depth + 1
+                    e.document = element.document
+                    e.root = root
+
+                    elements.append(e)
+
+    @property
+    def attributes(self):
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value):
+        self._attributes = XMLAttributeList(self, value)
+        self._attributesChanged()
+
+    @property
+    def subelements(self):
+        return self._subelements
 
-            e.superelement = self
+    @subelements.setter
+    def subelements(self, value):
+        self._subelements = XMLSubelementList(self, value)
+        self._subelements._added(self._subelements)
+        self._subelementsChanged()
+
+    def _attachSubelements(self, subelements):
+        """
+        Sets the subelements of a newly-created element, whose subelements 
+        already have their relational properties set, without the cost of 
+        notifying anything of the change.
+        """
+        self._subelements = XMLSubelementList(self, subelements)
+
+    def _attributesChanged(self):
+        self._attributeIndex = None
+
+    def _subelementsChanged(self):
+        e = self._textChanged()
+
+        if e.document != None:
+            e.document._invalidateElementIndex()
+
+    def _textChanged(self):
+        """
+        Clears the inner text of this element and the elements above it, and 
+        returns the top-most element.
+        """
+        e = self
+        e._innerText = None
+
+        while e.superelement != None:
+            e = e.superelement
+            e._innerText = None
+
+        return e
+
+    def _getAttributeIndex(self):
+        if self._attributeIndex == None:
+            self._attributeIndex = {}
+
+            # Only the first attribute with a given name counts, as in a linear scan.
+            for a in reversed(self._attributes):
+                self._attributeIndex[a.name] = a
+
+        return self._attributeIndex
+
+    def _getElementIndex(self):
+        """
+        Gets the index of this element's document, if this element is part 
+        of it, or None otherwise.
+        """
+        if self.document == None:
+            return None
+
+        index = self.document._getElementIndex()
+
+        if self._indexEntry == None or self._indexEntry[0] is not index:
+            return None
+
+        return index
 
     def setLineBreaks(self, lb1, lb2, lb3, lb4):
         self.lineBreakBeforeOpeningTag = lb1
@@ -165,21 +538,21 @@ class XMLElement(object):
         return len(self.attributes) > 0
 
     def hasAttribute(self, attributeName):
-        return len([a for a in self.attributes if a.name == attributeName]) > 0
+        return attributeName in self._getAttributeIndex()
 
     def getAttributeValue(self, attributeName):
-        a = [attribute for attribute in self.attributes if attribute.name == attributeName]
+        a = self._getAttributeIndex().get(attributeName)
 
-        if len(a) > 0:
-            return a[0].value
+        if a != None:
+            return a.value
         else:
             return ""
 
     def setAttributeValue(self, attributeName, attributeValue):
-        a = [attribute for attribute in self.attributes if attribute.name == attributeName]
+        a = self._getAttributeIndex().get(attributeName)
 
-        if len(a) > 0:
-            a[0].value = attributeValue
+        if a != None:
+            a.value = attributeValue
         else:
             self.attributes.append(XMLAttribute(attributeName, attributeValue))
 
@@ -202,58 +575,181 @@ class XMLElement(object):
             return None
 
     def getElementsByName(self, name, anyDepth=True):
-        e = [element for element in self.subelements if isinstance(element, XMLElement) and element.name == name]
-
+        """
+        Gets the elements with the given name under this element, in document 
+        order. If anyDepth is False, only the subelements of this element are 
+        included.
+        """
         if anyDepth:
-            for element in self.subelements:
-                if isinstance(element, XMLElement):
-                    e += element.getElementsByName(name, anyDepth)
+            index = self._getElementIndex()
 
-        return e
+            if index != None:
+                return index.getElementsByName(self, name)
+
+        return list(self.iterElementsByName(name, anyDepth))
 
     def getFirstElementWithName(self, name, anyDepth=True):
-        e = self.getElementsByName(name, anyDepth)
+        return self.findFirst(name, anyDepth)
 
-        if len(e) > 0:
-            return e[0]
-        else:
-            return None
+    def iterDescendants(self):
+        """
+        Yields the elements and text elements under this element, depth first 
+        in document order. The tree is walked with an explicit stack, and only 
+        as far as the caller reads.
+        """
+        stack = [iter(self.subelements)]
+
+        while len(stack) > 0:
+            for e in stack[-1]:
+                yield e
+
+                if isinstance(e, XMLElement) and len(e.subelements) > 0:
+                    stack.append(iter(e.subelements))
+                    break
+            else:
+                stack.pop()
+
+    def iterElementsByName(self, name, anyDepth=True):
+        """
+        Yields the elements with the given name under this element, in document 
+        order. If anyDepth is False, only the subelements of this element are 
+        included.
+        """
+        if not anyDepth:
+            for e in self.subelements:
+                if isinstance(e, XMLElement) and e.name == name:
+                    yield e
+
+            return
+
+        index = self._getElementIndex()
+
+        if index != None:
+            for e in index.getElementsByName(self, name):
+                yield e
+
+            return
+
+        for e in self.iterDescendants():
+            if isinstance(e, XMLElement) and e.name == name:
+                yield e
+
+    def findFirst(self, name, anyDepth=True):
+        """
+        Gets the first element with the given name under this element, in 
+        document order, or None if there isn't one. The search stops as soon as 
+        it finds a match.
+        """
+        if anyDepth:
+            index = self._getElementIndex()
+
+            if index != None:
+                return index.getFirstElementWithName(self, name)
+
+        return next(self.iterElementsByName(name, anyDepth), None)
 
     @property
     def innerText(self):
-        t = ""
-
-        for e in self.subelements:
-            if isinstance(e, XMLTextElement):
-                t += e.text
-            elif isinstance(e, XMLElement):
-                t += e.innerText
+        """
+        Gets the text of all of the text elements under this element. This is 
+        worked out in a single walk of the subtree, and then kept until this 
+        element or any element under it is changed.
+        """
+        if self._innerText == None:
+            self._innerText = "".join([e.text for e in self.iterDescendants() if isinstance(e, XMLTextElement)])
 
-        return t
+        return self._innerText
 
 
 class XMLTextElement(object):
+    """
+    Represents a run of text in an XML element. There are a great many of these 
+    in a document, so a text element only keeps its text and its superelement, 
+    and works out its other relational properties from its superelement.
+    """
+    __slots__ = ("superelement", "sourceStart", "sourceEnd", "_sourceLocation", "_text")
+
     def __init__(self, text=""):
-        self.document = None
-        self.root = None
         self.superelement = None
 
-        self.depth = 0
+        self.sourceStart = None
+        self.sourceEnd = None
+        self._sourceLocation = None
+
+        self._text = text
+
+    @property
+    def document(self):
+        return self.superelement.document if self.superelement != None else None
+
+    @property
+    def root(self):
+        if self.superelement == None:
+            return None
+        elif self.superelement.root == None:
+            return self.superelement
+        else:
+            return self.superelement.root
+
+    @property
+    def depth(self):
+        return self.superelement.depth + 1 if self.superelement != None else 0
 
-        self.text = text
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+
+        if self.superelement != None:
+            self.superelement._textChanged()
 
     def _setDepth(self, depth=0):
-        self.depth = depth
+        # The depth of a text element always follows from its superelement.
+        pass
+
+    def getSourceLocation(self):
+        """
+        Returns the line and column, counting from 1, at which this text starts 
+        in the text it was parsed from, or None if that is not known.
+        """
+        return _getSourceLocation(self)
 
 
 class XMLExporter(object):
+    _maximumNumberOfOpeningTags = 10000
+
+    # Text and attribute values are escaped with a translation table. Most 
+    # strings contain none of the special characters, so a precompiled 
+    # search is run first and those strings are returned unchanged.
+    _textEscapes = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+    _attributeValueEscapes = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;"})
+    _textSpecialCharacterPattern = re.compile(r"[&<>]")
+    _attributeValueSpecialCharacterPattern = re.compile(r"[&<>\"]")
+
     def __init__(self):
-        pass
+        self._lineBreaks = ["\n"]
+        self._openingTags = {}
+        self._closingTags = {}
 
     def exportDocument(self, document):
-        document.root._setDepth()
+        stream = io.StringIO()
+
+        self.writeDocument(document, stream)
 
-        return "{}\n{}".format(self.exportDeclaration(document.declaration), self.exportElement(document.root))
+        return stream.getvalue()
+
+    def writeDocument(self, document, stream):
+        """
+        Writes the given document to a stream, such as a file or an io.StringIO 
+        object, a fragment at a time, so the output is never built up as one 
+        string.
+        """
+        stream.write("{}\n".format(self.exportDeclaration(document.declaration)))
+
+        self.writeElement(document.root, stream, 0)
 
     def exportDeclaration(self, declaration):
         if isinstance(declaration, XMLDeclaration):
@@ -262,50 +758,141 @@ class XMLExporter(object):
             return "<!DOCTYPE html>"
 
     def exportElements(self, elements):
-        return "".join([self.exportElement(e) for e in elements])
+        stream = io.StringIO()
+
+        for e in elements:
+            self.writeElement(e, stream)
+
+        return stream.getvalue()
 
     def exportElement(self, element):
-        if isinstance(element, XMLTextElement):
-            return self.exportTextElement(element)
-        elif isinstance(element, XMLElement):
-            t1 = self.exportAttributes(element.attributes)
+        stream = io.StringIO()
+
+        self.writeElement(element, stream)
 
-            if element.isSelfClosing and len(element.subelements) == 0:    
-                if t1 == "":
-                    t2 = "<{} />".format(element.name)
+        return stream.getvalue()
+
+    def writeElement(self, element, stream, depth=None):
+        """
+        Writes the given element, and everything under it, to a stream. The 
+        tree is walked with an explicit stack, which holds the elements still 
+        to be written, together with their depths, and the closing tags of 
+        the elements that are open. The tree itself is left unchanged.
+
+        The element is indented for the given depth, or for its own depth if 
+        no depth is given.
+        """
+        write = stream.write
+        stack = [(element, element.depth if depth == None else depth)]
+
+        while len(stack) > 0:
+            item = stack.pop()
+
+            if isinstance(item, str):
+                write(item)
+                continue
+
+            e, d = item
+
+            if isinstance(e, XMLTextElement):
+                write(self.exportTextElement(e))
+            elif isinstance(e, XMLElement):
+                lineBreak = self._getLineBreak(d)
+
+                if e.isSelfClosing and len(e.subelements) == 0:
+                    if e.lineBreakBeforeOpeningTag:
+                        write(lineBreak)
+
+                    write(self._getOpeningTag(e, True))
+
+                    if e.lineBreakAfterClosingTag:
+                        write(lineBreak)
                 else:
-                    t2 = "<{} {} />".format(element.name, t1)
+                    if e.lineBreakBeforeOpeningTag:
+                        write(lineBreak)
+
+                    write(self._getOpeningTag(e, False))
+
+                    if e.lineBreakAfterOpeningTag:
+                        write(lineBreak)
+
+                    t = self._getClosingTag(e.name)
 
-                indentation = 4 * element.depth * " "
-                lb1 = "\n" + indentation if element.lineBreakBeforeOpeningTag else ""
-                lb4 = "\n" + indentation if element.lineBreakAfterClosingTag else ""
-                
-                return "{}{}{}".format(lb1, t2, lb4)
+                    if e.lineBreakBeforeClosingTag:
+                        t = lineBreak + t
+                    if e.lineBreakAfterClosingTag:
+                        t = t + lineBreak
+
+                    stack.append(t)
+                    stack.extend([(s, d + 1) for s in reversed(e.subelements)])
+
+    def _getLineBreak(self, depth):
+        """
+        Returns a line break followed by the indentation for the given depth. 
+        The strings are built once per depth and kept in a list.
+        """
+        lineBreaks = self._lineBreaks
+
+        while len(lineBreaks) <= depth:
+            lineBreaks.append("\n" + 4 * len(lineBreaks) * " ")
+
+        return lineBreaks[depth]
+
+    def _getOpeningTag(self, element, isSelfClosing):
+        """
+        Returns the opening tag of the given element. Tags are memoised by 
+        element name and attributes, as most elements in a document share 
+        both with many others. The memo is cleared when it gets too big, so 
+        that documents with many unique attribute values do not make it grow 
+        without bound.
+        """
+        key = (element.name, tuple([(a.name, a.value) for a in element.attributes]), isSelfClosing)
+        openingTag = self._openingTags.get(key)
+
+        if openingTag == None:
+            t1 = self.exportAttributes(element.attributes)
+
+            if t1 == "":
+                openingTag = "<{} />".format(element.name) if isSelfClosing else "<{}>".format(element.name)
             else:
-                if t1 == "":
-                    t2 = "<{}>".format(element.name)
-                else:
-                    t2 = "<{} {}>".format(element.name, t1)
+                openingTag = "<{} {} />".format(element.name, t1) if isSelfClosing else "<{} {}>".format(element.name, t1)
+
+            if len(self._openingTags) >= self._maximumNumberOfOpeningTags:
+                self._openingTags.clear()
+
+            self._openingTags[key] = openingTag
+
+        return openingTag
 
-                t3 = self.exportElements(element.subelements)
-                t4 = "</{}>".format(element.name)
+    def _getClosingTag(self, name):
+        closingTag = self._closingTags.get(name)
 
-                indentation = 4 * element.depth * " "
-                lb1 = "\n" + indentation if element.lineBreakBeforeOpeningTag else ""
-                lb2 = "\n" + indentation if element.lineBreakAfterOpeningTag else ""
-                lb3 = "\n" + indentation if element.lineBreakBeforeClosingTag else ""
-                lb4 = "\n" + indentation if element.lineBreakAfterClosingTag else ""
+        if closingTag == None:
+            closingTag = "</{}>".format(name)
+            self._closingTags[name] = closingTag
 
-                return "{}{}{}{}{}{}{}".format(lb1, t2, lb2, t3, lb3, t4, lb4)
+        return closingTag
 
     def exportAttributes(self, attributes):
         return " ".join([self.exportAttribute(a) for a in attributes if a.value != ""])
 
     def exportAttribute(self, attribute):
-        return "{}=\"{}\"".format(attribute.name, attribute.value)
+        return "{}=\"{}\"".format(attribute.name, self.escapeAttributeValue(attribute.value))
 
     def exportTextElement(self, textElement):
-        return textElement.text
+        return self.escapeText(textElement.text)
+
+    def escapeText(self, text):
+        if self._textSpecialCharacterPattern.search(text) == None:
+            return text
+
+        return text.translate(self._textEscapes)
+
+    def escapeAttributeValue(self, value):
+        if self._attributeValueSpecialCharacterPattern.search(value) == None:
+            return value
+
+        return value.translate(self._attributeValueEscapes)
 
 
 class Marker(object):
@@ -328,78 +915,683 @@ class Marker(object):
         return m
 
 
-def cut(text, start, length=1):
-    a = start
-    b = start + length
+class XMLInputBuffer(object):
+    """
+    Holds the part of an XML file that has been read but not yet parsed, so that the 
+    file can be parsed a chunk at a time.
 
-    return text[a:b]
+    Parameters
+    ----------
+    fileObject : file
+        A text file object to read from
+    chunkSize : int
+        The number of characters to read at a time
 
+    Attributes
+    ----------
+    text : str
+        The text that is currently buffered
+    marker : Marker
+        The position in the buffered text up to which it has been parsed
+    isAtEnd : bool
+        Whether or not the whole file has been read
+    offset : int
+        The offset in the file of the start of the buffered text
+    line : int
+        The line, counting from 1, of the last offset that was located
+    lineStart : int
+        The offset in the file of the start of that line
+    """
+    def __init__(self, fileObject, chunkSize=65536):
+        self.fileObject = fileObject
+        self.chunkSize = chunkSize
+
+        self.text = ""
+        self.marker = Marker()
+        self.isAtEnd = False
+        self.offset = 0
+
+        # Lines are counted as the text is parsed, up to the last offset that 
+        # was located, so that a table of where they start isn't needed.
+        self.line = 1
+        self.lineStart = 0
+        self._locatedOffset = 0
+
+    def read(self):
+        """
+        Reads another chunk of the file into the buffer, discarding the text that has 
+        already been parsed. Returns False if the end of the file has been reached.
+        """
+        if self.isAtEnd:
+            return False
 
-class XMLParsingError(Exception):
-    def __init__(self, message):
-        super(XMLParsingError, self).__init__(message)
+        chunk = self.fileObject.read(self.chunkSize)
 
+        if len(chunk) == 0:
+            self.isAtEnd = True
+            return False
 
-class XMLParser(object):
-    _elementNameCharacters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
-    _attributeNameCharacters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+        # The lines in the text that is discarded are counted first.
+        self._countLines(self.offset + self.marker.p)
 
-    def _expect(self, text, inputText, marker):
-        c = cut(inputText, marker.p, len(text))
+        self.offset += self.marker.p
+        self.text = self.text[self.marker.p:] + chunk
+        self.marker.p = 0
 
-        if c == text:
-            marker.p += len(c)
-            return True
-        else:
-            return False
+        return True
 
-    def _compressWhiteSpace(self, text):
-        return re.sub(r"\s+", " ", text)
+    def fill(self, terminator):
+        """
+        Reads chunks of the file until the buffer contains the given terminator after 
+        the marker, or until the end of the file is reached.
+        """
+        start = self.marker.p
 
-    def parseFromFile(self, filePath):
-        with open(filePath, "r", encoding="utf-8") as fo:
-            data = fo.read()
+        while self.text.find(terminator, start) < 0:
+            n = len(self.text) - self.marker.p
 
-            document = self.parseDocument(data)
+            if self.read() == False:
+                break
 
-            return document
+            start = max(0, n - len(terminator) + 1)
 
-    def parseDocument(self, inputText):
-        marker = Marker()
+    def _countLines(self, offset):
+        if offset <= self._locatedOffset:
+            return
 
-        d = self._getDeclaration(inputText, marker)
+        a = self._locatedOffset - self.offset
+        b = offset - self.offset
+
+        n = self.text.count("\n", a, b)
+
+        if n > 0:
+            self.line += n
+            self.lineStart = self.offset + self.text.rfind("\n", a, b) + 1
+
+        self._locatedOffset = offset
+
+    def canLocate(self, offset):
+        """
+        Returns whether or not getLineAndColumn can locate the given offset in 
+        the file.
+        """
+        return offset >= self._locatedOffset or offset >= self.lineStart
+
+    def getLineAndColumn(self, offset):
+        """
+        Returns the line and column, counting from 1, of the given offset in the 
+        file. The lines are only counted forwards, so the offset must be in the 
+        buffered text, and not before the start of the line of the last offset 
+        that was located.
+        """
+        self._countLines(offset)
+
+        return (self.line, offset - self.lineStart + 1)
+
+
+class XMLSourceLocator(object):
+    """
+    Finds the line and column of an offset in the text that a document was 
+    parsed from. The offsets at which the lines start are found as soon as 
+    the locator is made, so that the text isn't kept alive by the document, 
+    and every lookup is a bisection.
+
+    Parameters
+    ----------
+    text : str or bytes
+        The text that the document was parsed from, or None if the line 
+        starts are set afterwards
+    """
+    def __init__(self, text):
+        self._lineStarts = [0]
+
+        if text != None:
+            newline = "\n" if isinstance(text, str) else b"\n"
+
+            i = text.find(newline)
+
+            while i >= 0:
+                self._lineStarts.append(i + 1)
+
+                i = text.find(newline, i + 1)
+
+    def getLineAndColumn(self, position):
+        """
+        Returns the line and column, counting from 1, of the given offset.
+        """
+        line = bisect_right(self._lineStarts, position)
+
+        return (line, position - self._lineStarts[line - 1] + 1)
+
+
+def _getSourceLocation(node):
+    # Nodes that were parsed a chunk at a time have their location worked out 
+    # when they're parsed, since the text before them isn't kept.
+    if node._sourceLocation != None:
+        return node._sourceLocation
+
+    document = node.document
+
+    if node.sourceStart == None or document == None or document.sourceLocator == None:
+        return None
+
+    return document.sourceLocator.getLineAndColumn(node.sourceStart)
+
+
+class XMLParsingError(Exception):
+    """
+    Raised when the input is not well-formed XML.
+
+    Parameters
+    ----------
+    message : str
+        A description of the error
+    position : int, optional
+        The offset in the input at which the error was found
+    line : int, optional
+        The line, counting from 1, at which the error was found
+    column : int, optional
+        The column, counting from 1, at which the error was found
+    """
+    def __init__(self, message, position=None, line=None, column=None):
+        super(XMLParsingError, self).__init__(message)
+
+        self.message = message
+        self.position = position
+        self.line = line
+        self.column = column
+
+    def __str__(self):
+        if self.line != None:
+            return "{0} (line {1}, column {2})".format(self.message, self.line, self.column)
+
+        return self.message
+
+    def __reduce__(self):
+        # The position is kept when the error is passed between processes.
+        return (type(self), (self.message, self.position, self.line, self.column))
+
+    def _locate(self, sourceLocator):
+        if self.position != None and self.line == None:
+            self.line, self.column = sourceLocator.getLineAndColumn(self.position)
+
+
+class XMLParser(object):
+    _elementNameCharacters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+    _attributeNameCharacters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+
+    # Each token is found with a single match at the marker position and 
+    # then sliced out of the input once, rather than being built up one 
+    # character at a time.
+    _textPattern = re.compile(r"[^<>]+")
+    _elementNamePattern = re.compile("[" + re.escape(_elementNameCharacters) + "]+")
+    _attributeNamePattern = re.compile("[" + re.escape(_attributeNameCharacters) + "]+")
+    _whiteSpacePattern = re.compile(r"[ \t\r\n]+")
+    _compressibleWhiteSpacePattern = re.compile(r"[ \t\r\n]+")
+    _entityPattern = re.compile(r"&(?:(amp|lt|gt|quot|apos)|#([0-9]+)|#x([0-9A-Fa-f]+));")
+    _entities = {"amp": "&", "lt": "<", "gt": ">", "quot": "\"", "apos": "'"}
+
+    def __init__(self):
+        # Element and attribute names are interned through this table, so that 
+        # every element with the same name shares a single string.
+        self._names = {}
+
+    def _internName(self, name):
+        return self._names.setdefault(name, name)
+
+    def _decode(self, value):
+        """
+        Turns a piece of the input into a string. The input is already a 
+        string here, but not for XMLBytesParser.
+        """
+        return value
+
+    def _encode(self, text):
+        """
+        Turns a string into the same type as the input.
+        """
+        return text
+
+    def _expect(self, text, inputText, marker):
+        if inputText.startswith(text, marker.p):
+            marker.p += len(text)
+            return True
+        else:
+            return False
+
+    def _compressWhiteSpace(self, text):
+        return XMLParser._compressibleWhiteSpacePattern.sub(" ", text)
+
+    def _unescape(self, text, position=None):
+        """
+        Replaces the predefined entities and the character references in the 
+        given text. Text without an ampersand is returned unchanged. Other 
+        entities are left as they are. The position of the text in the input 
+        is only used for errors.
+        """
+        if "&" not in text:
+            return text
+
+        try:
+            return XMLParser._entityPattern.sub(self._getEntityValue, text)
+        except XMLParsingError as e:
+            e.position = position
+            raise
+
+    def _getEntityValue(self, match):
+        name, decimalCode, hexadecimalCode = match.groups()
+
+        if name != None:
+            return XMLParser._entities[name]
+
+        try:
+            return chr(int(decimalCode) if decimalCode != None else int(hexadecimalCode, 16))
+        except (ValueError, OverflowError):
+            raise XMLParsingError("Invalid character reference {0}.".format(match.group()))
+
+    def parseFromFile(self, filePath, memoryMap=False):
+        """
+        Parses the XML file at the given path. If memoryMap is True, the file 
+        is memory-mapped and its UTF-8 bytes are scanned directly, so there is 
+        never a decoded copy of the whole file in memory.
+        """
+        if memoryMap and os.path.getsize(filePath) > 0:
+            with open(filePath, "rb") as fo:
+                with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return XMLBytesParser(self._names).parseDocument(data)
+
+        with open(filePath, "r", encoding="utf-8") as fo:
+            data = fo.read()
+
+            document = self.parseDocument(data)
+
+            return document
+
+    def iterParseFromFile(self, filePath, chunkSize=65536):
+        """
+        Parses the XML file at the given path incrementally. See iterParse.
+        """
+        with open(filePath, "r", encoding="utf-8") as fo:
+            for event in self.iterParse(fo, chunkSize):
+                yield event
+
+    def iterParse(self, fileObject, chunkSize=65536):
+        """
+        Parses XML from a file object incrementally, reading it a chunk at a time, and 
+        yields a tuple of an event name and an object for each part of the document.
+
+        The events are "declaration", with an XMLDeclaration, then "start" and "end" 
+        for each element, with an XMLElement, and "text" for each text run, with an 
+        XMLTextElement. The elements have their depth, root and superelement set, but 
+        subelements are not attached to them, so only the elements that are currently 
+        open are kept in memory. The white space trimming rules are the same as for 
+        parseDocument.
+
+        The lines of the file are counted as it is read, and the line and column of 
+        each element and text run are found as it is parsed, so that getSourceLocation 
+        works for them as it does for a parsed document.
+        """
+        b = XMLInputBuffer(fileObject, chunkSize)
+
+        # Errors are found at positions in the buffered text, so they are moved 
+        # to positions in the file.
+        try:
+            yield from self._iterParseBuffer(b)
+        except XMLParsingError as e:
+            if e.position != None:
+                e.position += b.offset
+
+                if b.canLocate(e.position):
+                    e._locate(b)
+
+            raise
+
+    def _iterParseBuffer(self, b):
+        d = self._getFromBuffer(b, "?>", self._getDeclaration)
 
         if d == None:
-            raise XMLParsingError("Expected XML declaration.")
+            raise XMLParsingError("Expected XML declaration.", b.marker.p)
+
+        yield ("declaration", d)
+
+        b.fill("<")
+        self._getWhiteSpace(b.text, b.marker)
+
+        # The sum of the offset of the buffer and the position of its marker is 
+        # the position in the file, even when more of the file is read.
+        start = b.offset + b.marker.p
+
+        t = self._getFromBuffer(b, ">", self._getOpeningTag)
+
+        if t == None:
+            raise XMLParsingError("Expected root element.", b.marker.p)
+
+        root, hasContent = t
+
+        root.sourceStart = start
+        root._sourceLocation = b.getLineAndColumn(start)
+
+        if not hasContent:
+            root.sourceEnd = b.offset + b.marker.p
+
+        yield ("start", root)
+
+        if not hasContent:
+            yield ("end", root)
+            return
+
+        openElements = [root]
+
+        # A text run that is a single space is dropped if it is the first or the last 
+        # subelement of an element, so it is held back until the next event shows 
+        # whether or not it is the last one.
+        isEmpty = True
+        pendingTextElement = None
+
+        while len(openElements) > 0:
+            e = openElements[-1]
+
+            b.fill("<")
+
+            start = b.offset + b.marker.p
+
+            textElement = self._getTextElement(b.text, b.marker)
+
+            if textElement != None:
+                textElement.superelement = e
+                textElement.sourceStart = start
+                textElement.sourceEnd = b.offset + b.marker.p
+                textElement._sourceLocation = b.getLineAndColumn(start)
+
+                if textElement.text == " ":
+                    if not isEmpty:
+                        pendingTextElement = textElement
+                else:
+                    yield ("text", textElement)
+
+                    isEmpty = False
+
+                continue
+
+            t = self._getFromBuffer(b, ">", self._getOpeningTag)
+
+            if t != None:
+                element, hasContent = t
 
-        self._getWhiteSpace(inputText, marker)
+                element.root = root
+                element.superelement = e
+                element.depth = e.depth + 1
+                element.sourceStart = start
+                element._sourceLocation = b.getLineAndColumn(start)
 
-        root = self._getElement(inputText, marker)
+                if not hasContent:
+                    element.sourceEnd = b.offset + b.marker.p
 
-        if root == None:
-            raise XMLParsingError("Expected root element.")
+                if pendingTextElement != None:
+                    yield ("text", pendingTextElement)
 
-        document = XMLDocument(d, root)
+                    pendingTextElement = None
+
+                yield ("start", element)
+
+                if hasContent:
+                    openElements.append(element)
+
+                    isEmpty = True
+                else:
+                    yield ("end", element)
+
+                    isEmpty = False
+
+                continue
+
+            self._getFromBuffer(b, ">", lambda inputText, marker: self._getClosingTag(e.name, inputText, marker))
+
+            e.sourceEnd = b.offset + b.marker.p
+
+            pendingTextElement = None
+            openElements.pop()
+            isEmpty = False
+
+            yield ("end", e)
+
+    def _getFromBuffer(self, inputBuffer, terminator, getter):
+        """
+        Calls the given getter function on the text in an input buffer, once the buffer 
+        contains the given terminator. If the getter fails, it may be because the token 
+        continues past the end of the buffer, so more of the file is read and the getter 
+        is tried again.
+        """
+        while True:
+            inputBuffer.fill(terminator)
+
+            m = inputBuffer.marker.copy()
+
+            try:
+                result = getter(inputBuffer.text, m)
+            except XMLParsingError:
+                if inputBuffer.read() == True:
+                    continue
+                else:
+                    raise
+
+            inputBuffer.marker.p = m.p
+
+            return result
+
+    def buildElementFromEvents(self, element, events):
+        """
+        Consumes the events that follow the start event of the given element, up to and 
+        including its end event, and attaches the subelements that they describe to the 
+        element. Returns the element.
+        """
+        subelements = {element: []}
+
+        for event, e in events:
+            if event == "start" or event == "text":
+                subelements[e.superelement].append(e)
+
+                if event == "start":
+                    subelements[e] = []
+            elif event == "end":
+                e._attachSubelements(subelements.pop(e))
+
+                if e is element:
+                    break
+
+        return element
+
+    def parseDocument(self, inputText):
+        sourceLocator = XMLSourceLocator(inputText)
+
+        try:
+            marker = Marker()
+
+            d = self._getDeclaration(inputText, marker)
+
+            if d == None:
+                raise XMLParsingError("Expected XML declaration.", marker.p)
+
+            self._getWhiteSpace(inputText, marker)
+
+            document = XMLDocument(d)
+
+            root = self._getElement(inputText, marker, document)
+
+            if root == None:
+                raise XMLParsingError("Expected root element.", marker.p)
+        except XMLParsingError as e:
+            e._locate(sourceLocator)
+            raise
+
+        document.root = root
+        document.sourceLocator = sourceLocator
 
         return document
 
-    def _getTextElement(self, inputText, marker):
-        m = marker
-        t = ""
+    def reparseDocument(self, document, oldText, newText, elementName="section"):
+        """
+        Updates a document that was parsed from oldText so that it matches 
+        newText. Only the smallest element with the given name that encloses 
+        all of the changes is parsed again, and the new element takes its 
+        place in the tree. The source positions of the elements that follow 
+        it are shifted to match. If there is no such element, or the changed 
+        text no longer forms a single element, the whole of newText is parsed 
+        instead.
+
+        Returns the document, which is updated in place.
+        """
+        if oldText == newText:
+            return document
 
-        while m.p < len(inputText):
-            c = cut(inputText, m.p)
+        a, b = self._getChangedRange(oldText, newText)
+        delta = len(newText) - len(oldText)
 
-            if c not in "<>":
-                t += c
-                m.p += 1
-            else:
-                break
+        for element in reversed(self._getEnclosingElements(document, a, b, elementName)):
+            newElement = self._reparseElement(element, newText, delta)
+
+            if newElement != None:
+                self._replaceElement(element, newElement, delta)
+
+                document.sourceLocator = XMLSourceLocator(newText)
+
+                return document
+
+        d = self.parseDocument(newText)
+
+        document.declaration = d.declaration
+        document.root = d.root
+        document.sourceLocator = d.sourceLocator
+
+        d.root.document = document
+        d.root._setDepth()
+
+        return document
+
+    def _getChangedRange(self, oldText, newText):
+        """
+        Returns the start and end of the part of oldText that differs from 
+        newText, found by skipping their common prefix and suffix. The texts 
+        are compared a chunk at a time, so that most of the work is done by 
+        slice comparisons.
+        """
+        n = min(len(oldText), len(newText))
+        chunkSize = 4096
+
+        a = 0
+
+        while a + chunkSize <= n and oldText[a:a + chunkSize] == newText[a:a + chunkSize]:
+            a += chunkSize
+
+        while a < n and oldText[a] == newText[a]:
+            a += 1
 
-        if len(t) == 0:
+        m = n - a
+        b = 0
+
+        while b + chunkSize <= m and oldText[len(oldText) - b - chunkSize:len(oldText) - b] == newText[len(newText) - b - chunkSize:len(newText) - b]:
+            b += chunkSize
+
+        while b < m and oldText[len(oldText) - b - 1] == newText[len(newText) - b - 1]:
+            b += 1
+
+        return (a, len(oldText) - b)
+
+    def _getEnclosingElements(self, document, start, end, elementName):
+        """
+        Returns the elements with the given name whose source spans enclose 
+        the given range, from the outermost to the innermost.
+        """
+        elements = []
+        e = document.root
+
+        while e != None:
+            if e.name == elementName:
+                elements.append(e)
+
+            superelement = e
+            e = None
+
+            for s in superelement.subelements:
+                if isinstance(s, XMLElement) and s.sourceStart != None and s.sourceStart <= start and end <= s.sourceEnd:
+                    e = s
+                    break
+
+        return elements
+
+    def _reparseElement(self, element, newText, delta):
+        """
+        Parses the new text of the given element. Returns None if the new text 
+        does not form a single element that ends where the old one now ends.
+        """
+        m = Marker()
+        m.p = element.sourceStart
+
+        try:
+            newElement = self._getElement(newText, m, element.document)
+        except XMLParsingError:
+            return None
+
+        if newElement == None or m.p != element.sourceEnd + delta:
+            return None
+
+        return newElement
+
+    def _replaceElement(self, element, newElement, delta):
+        superelement = element.superelement
+
+        if superelement == None:
+            element.document.root = newElement
+            newElement._setDepth()
+
+            return
+
+        newElement.root = element.root
+        newElement._setDepth(element.depth)
+
+        # The elements that come after the new element in the document are 
+        # shifted by the change in length, and so are the ends of the elements 
+        # that enclose it.
+        child = element
+        e = superelement
+
+        while e != None:
+            subelements = e.subelements
+            i = next(i for i, s in enumerate(subelements) if s is child)
+
+            if child is element:
+                subelements[i] = newElement
+
+            if delta != 0:
+                e.sourceEnd += delta
+
+                self._shiftSourcePositions(subelements[i + 1:], delta)
+
+            child = e
+            e = e.superelement
+
+    def _shiftSourcePositions(self, elements, delta):
+        stack = list(elements)
+
+        while len(stack) > 0:
+            e = stack.pop()
+
+            if e.sourceStart != None:
+                e.sourceStart += delta
+                e.sourceEnd += delta
+
+            if isinstance(e, XMLElement):
+                stack.extend(e.subelements)
+
+    def _getTextElement(self, inputText, marker):
+        match = self._textPattern.match(inputText, marker.p)
+
+        if match == None:
             return None
 
-        t = self._compressWhiteSpace(t)
+        t = self._compressWhiteSpace(self._unescape(self._decode(match.group()), marker.p))
+
+        marker.p = match.end()
 
         return XMLTextElement(t)
 
@@ -422,7 +1614,7 @@ class XMLParser(object):
         self._getWhiteSpace(inputText, m)
 
         if self._expect("?>", inputText, m) == False:
-            raise XMLParsingError("Expected closing bracket ?>.")
+            raise XMLParsingError("Expected closing bracket ?>.", m.p)
 
         marker.p = m.p
 
@@ -432,7 +1624,88 @@ class XMLParser(object):
 
         return d
 
-    def _getElement(self, inputText, marker):
+    def _getElement(self, inputText, marker, document=None):
+        m = marker.copy()
+        start = m.p
+
+        t = self._getOpeningTag(inputText, m)
+
+        if t == None:
+            return None
+
+        root, hasContent = t
+
+        root.document = document
+        root.sourceStart = start
+
+        if not hasContent:
+            root.sourceEnd = m.p
+
+        # The elements that are currently open are kept on an explicit stack 
+        # rather than on the call stack, so the depth of nesting isn't limited 
+        # by Python's recursion limit. The relational properties of each 
+        # element are set as soon as it is created, and its subelements are 
+        # collected in a plain list until it is closed.
+        openElements = [(root, [])] if hasContent else []
+
+        while len(openElements) > 0:
+            e, subelements = openElements[-1]
+            start = m.p
+
+            textElement = self._getTextElement(inputText, m)
+
+            if textElement != None:
+                textElement.superelement = e
+                textElement.sourceStart = start
+                textElement.sourceEnd = m.p
+
+                subelements.append(textElement)
+                continue
+
+            t = self._getOpeningTag(inputText, m)
+
+            if t != None:
+                element, hasContent = t
+
+                element.document = document
+                element.root = root
+                element.superelement = e
+                element.depth = e.depth + 1
+                element.sourceStart = start
+
+                subelements.append(element)
+
+                if hasContent:
+                    openElements.append((element, []))
+                else:
+                    element.sourceEnd = m.p
+
+                continue
+
+            self._getClosingTag(e.name, inputText, m)
+
+            e.sourceEnd = m.p
+
+            if len(subelements) > 0 and isinstance(subelements[0], XMLTextElement) and subelements[0].text == " ":
+                del subelements[0]
+
+            if len(subelements) > 0 and isinstance(subelements[-1], XMLTextElement) and subelements[-1].text == " ":
+                del subelements[-1]
+
+            e._attachSubelements(subelements)
+
+            openElements.pop()
+
+        marker.p = m.p
+
+        return root
+
+    def _getOpeningTag(self, inputText, marker):
+        """
+        Gets an opening or self-closing tag, and returns a tuple of a new 
+        element and whether or not that element has content to follow. 
+        Returns None if there is no opening tag at the marker.
+        """
         m = marker.copy()
 
         if self._expect("<", inputText, m) == False:
@@ -462,71 +1735,39 @@ class XMLParser(object):
         if self._expect("/>", inputText, m) == True:
             marker.p = m.p
 
-            return e
+            return (e, False)
         elif self._expect(">", inputText, m) == True:
-
-            subelements = []
-
-            while True:
-                textElement = self._getTextElement(inputText, m)
-
-                if textElement != None:
-                    subelements.append(textElement)
-                    continue
-
-                element = self._getElement(inputText, m)
-
-                if element != None:
-                    subelements.append(element)
-                    continue
-
-                break
-
-            if self._expect("</", inputText, m) == False:
-                raise XMLParsingError("Expected closing XML tag </{0}>.".format(name))
-
-            self._getWhiteSpace(inputText, m)
-
-            if self._expect(name, inputText, m) == False:
-                raise XMLParsingError("Expected closing XML tag </{0}>.".format(name))
-
-            self._getWhiteSpace(inputText, m)
-
-            if self._expect(">", inputText, m) == False:
-                raise XMLParsingError("Expected closing XML tag </{0}>.".format(name))
-
             marker.p = m.p
 
-            if len(subelements) > 0 and isinstance(subelements[0], XMLTextElement) and subelements[0].text == " ":
-                subelements = subelements[1:]
+            return (e, True)
+        else:
+            raise XMLParsingError("Expected closing bracket >.", m.p)
 
-            if len(subelements) > 0 and isinstance(subelements[-1], XMLTextElement) and subelements[-1].text == " ":
-                subelements = subelements[:-1]
+    def _getClosingTag(self, name, inputText, marker):
+        m = marker
 
-            e.subelements = subelements
+        if self._expect("</", inputText, m) == False:
+            raise XMLParsingError("Expected closing XML tag </{0}>.".format(name), m.p)
 
-            return e
+        self._getWhiteSpace(inputText, m)
 
-        else:
-            raise XMLParsingError("Expected closing bracket >.")
+        if self._expect(name, inputText, m) == False:
+            raise XMLParsingError("Expected closing XML tag </{0}>.".format(name), m.p)
 
-    def _getElementName(self, inputText, marker):
-        m = marker
-        t = ""
+        self._getWhiteSpace(inputText, m)
 
-        while m.p < len(inputText):
-            c = cut(inputText, m.p)
+        if self._expect(">", inputText, m) == False:
+            raise XMLParsingError("Expected closing XML tag </{0}>.".format(name), m.p)
 
-            if c in XMLParser._elementNameCharacters:
-                t += c
-                m.p += 1
-            else:
-                break
+    def _getElementName(self, inputText, marker):
+        match = self._elementNamePattern.match(inputText, marker.p)
 
-        if len(t) == 0:
+        if match == None:
             return None
 
-        return t
+        marker.p = match.end()
+
+        return self._internName(match.group())
 
     def _getAttribute(self, inputText, marker):
         m = marker.copy()
@@ -554,26 +1795,17 @@ class XMLParser(object):
         return a
 
     def _getAttributeName(self, inputText, marker):
-        m = marker
-        t = ""
-
-        while m.p < len(inputText):
-            c = cut(inputText, m.p)
+        match = self._attributeNamePattern.match(inputText, marker.p)
 
-            if c in XMLParser._attributeNameCharacters:
-                t += c
-                m.p += 1
-            else:
-                break
-
-        if len(t) == 0:
+        if match == None:
             return None
 
-        return t
+        marker.p = match.end()
+
+        return self._internName(match.group())
 
     def _getAttributeValue(self, inputText, marker):
         m = marker.copy()
-        t = ""
         quoteMarkType = "none"
         q = ""
 
@@ -586,32 +1818,537 @@ class XMLParser(object):
         else:
             return None
 
-        while True:
-            c = cut(inputText, m.p, len(q))
-            m.p += 1
-            if c == q:
-                break
-            else:
-                t += c
+        i = inputText.find(self._encode(q), m.p)
 
-        marker.p = m.p
+        if i < 0:
+            raise XMLParsingError("Expected closing quote mark {0}.".format(q), marker.p)
+
+        t = self._unescape(self._decode(inputText[m.p:i]), marker.p)
+
+        marker.p = i + 1
 
         return t
 
     def _getWhiteSpace(self, inputText, marker):
-        m = marker
-        t = ""
+        match = self._whiteSpacePattern.match(inputText, marker.p)
 
-        while m.p < len(inputText):
-            c = cut(inputText, m.p)
+        if match == None:
+            return None
 
-            if c in " \t\n":
-                t += c
-                m.p += 1
-            else:
+        marker.p = match.end()
+
+        return self._decode(match.group())
+
+
+class XMLBytesParser(XMLParser):
+    """
+    An XML parser that scans UTF-8 bytes, from a bytes object or a memory-mapped 
+    file, rather than a string. Only the text runs, names and attribute values 
+    are decoded, when the nodes for them are created. Positions in the input 
+    are byte offsets rather than character offsets.
+
+    Parameters
+    ----------
+    names : dict, optional
+        A table of interned names to share with another parser
+    """
+    _textPattern = re.compile(rb"[^<>]+")
+    _elementNamePattern = re.compile(("[" + re.escape(XMLParser._elementNameCharacters) + "]+").encode("ascii"))
+    _attributeNamePattern = re.compile(("[" + re.escape(XMLParser._attributeNameCharacters) + "]+").encode("ascii"))
+    _whiteSpacePattern = re.compile(rb"[ \t\r\n]+")
+
+    def __init__(self, names=None):
+        super(XMLBytesParser, self).__init__()
+
+        if names != None:
+            self._names = names
+
+        self._encodedNames = {}
+
+    def _internName(self, name):
+        n = self._encodedNames.get(name)
+
+        if n == None:
+            n = super(XMLBytesParser, self)._internName(name.decode("utf-8"))
+
+            self._encodedNames[name] = n
+
+        return n
+
+    def _decode(self, value):
+        return value.decode("utf-8")
+
+    def _encode(self, text):
+        return text.encode("utf-8")
+
+    def _expect(self, text, inputText, marker):
+        t = self._encode(text)
+
+        if inputText[marker.p:marker.p + len(t)] == t:
+            marker.p += len(t)
+            return True
+        else:
+            return False
+
+
+class XMLExpatHandler(object):
+    """
+    Receives the callbacks from an expat parser and turns them into the same events, 
+    or the same tree, as XMLParser would produce, including its white space 
+    compression and trimming rules.
+
+    Parameters
+    ----------
+    xmlParser : XMLParser
+        The parser whose white space rules should be used
+    document : XMLDocument, optional
+        If this is given, subelements are attached to their superelements to build a 
+        tree for this document, rather than just being passed on as events
+
+    Attributes
+    ----------
+    events : list<tuple>
+        The events that have been produced since this list was last emptied
+    declaration : XMLDeclaration
+        The XML declaration, once it has been parsed
+    root : XMLElement
+        The root element, once it has been parsed
+    """
+    def __init__(self, xmlParser, document=None):
+        self.xmlParser = xmlParser
+        self.document = document
+
+        self.events = []
+        self.declaration = None
+        self.root = None
+
+        self._openElements = []
+        self._openSubelements = []
+        self._textFragments = []
+        self._isEmpty = True
+        self._pendingTextElement = None
+
+        self.parser = expat.ParserCreate(intern=xmlParser._names)
+        self.parser.ordered_attributes = True
+        self.parser.buffer_text = True
+        self.parser.XmlDeclHandler = self._declaration
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        self.parser.CharacterDataHandler = self._characterData
+
+    def feed(self, data, isFinal=False):
+        try:
+            self.parser.Parse(data, isFinal)
+        except expat.ExpatError as e:
+            raise XMLParsingError(expat.ErrorString(e.code), None, e.lineno, e.offset + 1)
+
+    def feedFile(self, fileObject):
+        try:
+            self.parser.ParseFile(fileObject)
+        except expat.ExpatError as e:
+            raise XMLParsingError(expat.ErrorString(e.code), None, e.lineno, e.offset + 1)
+
+    def _emit(self, event, e):
+        if self.document != None:
+            if event == "start":
+                if e.superelement != None:
+                    self._openSubelements[-1].append(e)
+
+                self._openSubelements.append([])
+            elif event == "text":
+                self._openSubelements[-1].append(e)
+            elif event == "end":
+                e._attachSubelements(self._openSubelements.pop())
+        else:
+            self.events.append((event, e))
+
+    def _setRelationalProperties(self, e):
+        superelement = self._openElements[-1]
+
+        e.document = self.document
+        e.root = self.root
+        e.superelement = superelement
+        e.depth = superelement.depth + 1
+
+    def _declaration(self, version, encoding, standalone):
+        d = XMLDeclaration()
+
+        if version != None:
+            d.version = version
+
+        if encoding != None:
+            d.encoding = encoding
+
+        if standalone != -1:
+            d.standalone = "yes" if standalone == 1 else "no"
+
+        self.declaration = d
+
+        self._emit("declaration", d)
+
+    def _characterData(self, data):
+        if len(self._openElements) > 0:
+            self._textFragments.append(data)
+
+    def _flushText(self):
+        if len(self._textFragments) == 0:
+            return
+
+        t = self.xmlParser._compressWhiteSpace("".join(self._textFragments))
+
+        self._textFragments = []
+
+        textElement = XMLTextElement(t)
+
+        textElement.superelement = self._openElements[-1]
+
+        # As in XMLParser, a single space is dropped if it is the first or the last 
+        # subelement of an element.
+        if t == " ":
+            if not self._isEmpty:
+                self._pendingTextElement = textElement
+        else:
+            self._emit("text", textElement)
+
+            self._isEmpty = False
+
+    def _start(self, name, attributes):
+        if self.declaration == None:
+            raise XMLParsingError("Expected XML declaration.", None, self.parser.CurrentLineNumber, self.parser.CurrentColumnNumber + 1)
+
+        self._flushText()
+
+        e = XMLElement(name)
+
+        e.attributes = [XMLAttribute(attributes[i], attributes[i + 1]) for i in range(0, len(attributes), 2)]
+
+        if len(self._openElements) > 0:
+            self._setRelationalProperties(e)
+        else:
+            e.document = self.document
+
+            self.root = e
+
+        if self._pendingTextElement != None:
+            self._emit("text", self._pendingTextElement)
+
+            self._pendingTextElement = None
+
+        self._emit("start", e)
+
+        self._openElements.append(e)
+        self._isEmpty = True
+
+    def _end(self, name):
+        self._flushText()
+
+        self._pendingTextElement = None
+
+        e = self._openElements.pop()
+
+        self._emit("end", e)
+
+        self._isEmpty = False
+
+
+class ExpatXMLParser(XMLParser):
+    """
+    An XML parser with the same interface and results as XMLParser, which uses the 
+    expat parser from the standard library, so the scanning is done in C rather than 
+    in Python.
+
+    Unlike XMLParser, expat decodes entity references and character references, 
+    normalises the white space in attribute values, and rejects documents that aren't 
+    well-formed, such as those with white space inside closing tags.
+    """
+
+    def parseFromFile(self, filePath, memoryMap=False):
+        # expat reads the file in chunks of bytes anyway, so memory-mapping it 
+        # makes no difference here.
+        document = XMLDocument(None)
+
+        h = XMLExpatHandler(self, document)
+
+        with open(filePath, "rb") as fo:
+            h.feedFile(fo)
+
+        document.declaration = h.declaration
+        document.root = h.root
+
+        return document
+
+    def parseDocument(self, inputText):
+        document = XMLDocument(None)
+
+        h = XMLExpatHandler(self, document)
+
+        h.feed(inputText, True)
+
+        document.declaration = h.declaration
+        document.root = h.root
+
+        return document
+
+    def iterParse(self, fileObject, chunkSize=65536):
+        h = XMLExpatHandler(self)
+
+        while True:
+            data = fileObject.read(chunkSize)
+            isFinal = len(data) == 0
+
+            h.feed(data, isFinal)
+
+            events = h.events
+            h.events = []
+
+            for event in events:
+                yield event
+
+            if isFinal:
                 break
 
-        if len(t) == 0:
+
+class XMLDocumentCache(object):
+    """
+    An on-disk cache of parsed XML documents, for files that are parsed again 
+    and again without changing. An entry is only used if the path, size, 
+    modification time and content hash of the file all match those it was 
+    made from. The tree is stored as a flat list of tuples, one per node, 
+    which marshal can load much faster than the file can be parsed again. 
+    When the cache gets bigger than its maximum size, the entries that were 
+    used least recently are removed.
+
+    Parameters
+    ----------
+    directory : str, optional
+        The directory to keep the cache in. Defaults to a "graph" directory in 
+        the user's cache directory.
+    maximumSize : int, optional
+        The maximum total size of the entries in the cache, in bytes
+    """
+    # This is changed whenever the format of the entries changes, so that old 
+    # entries are ignored.
+    _formatVersion = 1
+
+    def __init__(self, directory=None, maximumSize=256 * 1024 * 1024):
+        if directory == None:
+            directory = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "graph")
+
+        self.directory = directory
+        self.maximumSize = maximumSize
+
+    def getDocument(self, filePath, xmlParser):
+        """
+        Gets the document in the XML file at the given path from the cache, or 
+        parses it with the given parser and adds it to the cache. Problems with 
+        the cache itself, such as an unwritable directory, are ignored.
+        """
+        filePath = os.path.abspath(filePath)
+        status = os.stat(filePath)
+
+        with open(filePath, "rb") as fo:
+            data = fo.read()
+
+        parserName = type(xmlParser).__name__
+        key = (XMLDocumentCache._formatVersion, parserName, filePath, status.st_size, status.st_mtime_ns, hashlib.blake2b(data).hexdigest())
+        entryPath = os.path.join(self.directory, hashlib.blake2b("{}:{}".format(parserName, filePath).encode("utf-8"), digest_size=16).hexdigest() + ".marshal")
+
+        document = self._load(entryPath, key)
+
+        if document == None:
+            text = data.decode("utf-8")
+
+            # The bytes aren't needed any more, so they're let go of before the 
+            # tree is built.
+            data = None
+
+            # The same line breaks as when the file is read as text.
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+            document = xmlParser.parseDocument(text)
+
+            self._store(entryPath, key, document)
+
+        return document
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        for entryPath in self._getEntryPaths():
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass
+
+    def _getEntryPaths(self):
+        try:
+            return [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".marshal")]
+        except OSError:
+            return []
+
+    def _load(self, entryPath, key):
+        # The key is stored first, on its own, so that a stale entry is found 
+        # without loading the tree. The tree is read in one go, as marshal is 
+        # much slower at loading from a file object than from bytes.
+        try:
+            with open(entryPath, "rb") as fo:
+                if marshal.load(fo) != key:
+                    return None
+
+                declarationAttributes, lineStarts, nodes = marshal.loads(fo.read())
+
+            os.utime(entryPath)
+        except (OSError, EOFError, ValueError, TypeError):
             return None
 
-        return t
+        return self._makeDocument(declarationAttributes, lineStarts, nodes)
+
+    def _store(self, entryPath, key, document):
+        declarationAttributes = []
+
+        if document.declaration != None:
+            for a in document.declaration.attributes:
+                declarationAttributes.extend((a.name, a.value))
+
+        if document.sourceLocator != None:
+            lineStarts = document.sourceLocator._lineStarts
+        else:
+            lineStarts = None
+
+        value = (tuple(declarationAttributes), lineStarts, self._getNodes(document.root))
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # The entry is written to a temporary file first, so that another 
+            # process never sees half of it.
+            fd, temporaryPath = tempfile.mkstemp(".tmp", dir=self.directory)
+
+            try:
+                with os.fdopen(fd, "wb") as fo:
+                    marshal.dump(key, fo)
+                    marshal.dump(value, fo)
+
+                os.replace(temporaryPath, entryPath)
+            except BaseException:
+                os.remove(temporaryPath)
+                raise
+
+            self._evict()
+        except (OSError, ValueError):
+            pass
+
+    def _evict(self):
+        entries = []
+        totalSize = 0
+
+        for entryPath in self._getEntryPaths():
+            try:
+                status = os.stat(entryPath)
+            except OSError:
+                continue
+
+            entries.append((status.st_mtime, status.st_size, entryPath))
+            totalSize += status.st_size
+
+        entries.sort()
+
+        for modificationTime, size, entryPath in entries:
+            if totalSize <= self.maximumSize:
+                break
+
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass
+
+            totalSize -= size
+
+    def _getNodes(self, root):
+        """
+        Flattens a tree into a list of tuples in document order. An element is 
+        a tuple of its name, attributes, flags, source positions and number of 
+        subelements, and a text element a tuple of its text and source 
+        positions. The list is flat, rather than nested, so that there is no 
+        limit to the depth of the tree that marshal can store.
+        """
+        nodes = []
+        stack = [root]
+
+        while len(stack) > 0:
+            e = stack.pop()
+
+            if isinstance(e, XMLTextElement):
+                nodes.append((e.text, e.sourceStart, e.sourceEnd))
+            else:
+                attributes = []
+
+                for a in e.attributes:
+                    attributes.extend((a.name, a.value))
+
+                nodes.append((e.name, tuple(attributes), e._flags, e.sourceStart, e.sourceEnd, len(e.subelements)))
+
+                stack.extend(reversed(e.subelements))
+
+        return nodes
+
+    def _makeDocument(self, declarationAttributes, lineStarts, nodes):
+        declaration = XMLDeclaration()
+        declaration.attributes = [XMLAttribute(declarationAttributes[i], declarationAttributes[i + 1]) for i in range(0, len(declarationAttributes), 2)]
+
+        document = XMLDocument(declaration)
+
+        if lineStarts != None:
+            document.sourceLocator = XMLSourceLocator(None)
+            document.sourceLocator._lineStarts = lineStarts
+
+        # Each open element is kept on the stack with its subelements so far 
+        # and the number of subelements it has, and is closed once it has all 
+        # of them.
+        root = None
+        openElements = []
+
+        for node in nodes:
+            if len(node) == 3:
+                e = XMLTextElement(node[0])
+                e.superelement = openElements[-1][0]
+                e.sourceStart = node[1]
+                e.sourceEnd = node[2]
+
+                openElements[-1][1].append(e)
+            else:
+                name, attributes, flags, sourceStart, sourceEnd, numberOfSubelements = node
+
+                e = XMLElement(name)
+
+                if len(attributes) > 0:
+                    e._attributes = XMLAttributeList(e, [XMLAttribute(attributes[i], attributes[i + 1]) for i in range(0, len(attributes), 2)])
+
+                e._flags = flags
+                e.sourceStart = sourceStart
+                e.sourceEnd = sourceEnd
+                e.document = document
+
+                if root == None:
+                    root = e
+                else:
+                    superelement, subelements, n = openElements[-1]
+
+                    e.superelement = superelement
+                    e.root = root
+                    e.depth = superelement.depth + 1
+
+                    subelements.append(e)
+
+                openElements.append((e, [], numberOfSubelements))
+
+            while len(openElements) > 0 and len(openElements[-1][1]) == openElements[-1][2]:
+                e, subelements, n = openElements.pop()
+
+                e._attachSubelements(subelements)
+
+        document.root = root
+
+        return document
@@ -0,0 +1,345 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+from graph.core import *
+
+
+# Registered at runtime in a test, and defined here so that it can be pickled 
+# and handed to spawned processes.
+class GNote(GContentElement):
+    __slots__ = ("kind",)
+
+    _elementNames = ["note"]
+
+    def __init__(self):
+        super(GNote, self).__init__()
+
+        self.kind = ""
+
+
+def configureNote(importer, e, xmlElement):
+    e.kind = xmlElement.getAttributeValue("kind")
+
+
+class TestCore(unittest.TestCase):
+
+    def assertPageElementsEqual(self, elements1, elements2):
+        self.assertEqual(len(elements1), len(elements2))
+
+        for e1, e2 in zip(elements1, elements2):
+            self.assertEqual(type(e1), type(e2))
+
+            if isinstance(e1, GTextElement):
+                self.assertEqual(e1.text, e2.text)
+            else:
+                self.assertEqual(e1.id, e2.id)
+                self.assertEqual(e1.styleClass, e2.styleClass)
+                self.assertPageElementsEqual(e1.subelements, e2.subelements)
+
+    def assertDocumentsEqual(self, d1, d2):
+        self.assertEqual(d2.title, d1.title)
+        self.assertEqual(d2.subtitle, d1.subtitle)
+        self.assertEqual(d2.keywords, d1.keywords)
+        self.assertEqual(d2.isbn, d1.isbn)
+        self.assertEqual([c.name for c in d2.contributors], [c.name for c in d1.contributors])
+        self.assertEqual([t.reference for t in d2.templates], [t.reference for t in d1.templates])
+        self.assertEqual(len(d2.sections), len(d1.sections))
+
+        for s1, s2 in zip(d1.sections, d2.sections):
+            self.assertEqual(s2.styleClass, s1.styleClass)
+            self.assertEqual(s2.pageTemplateReference, s1.pageTemplateReference)
+            self.assertIs(s2.document, d2)
+            self.assertPageElementsEqual(s1.subelements, s2.subelements)
+
+    def test_import_example_1_streaming(self):
+        importer = GImporter()
+
+        d1 = importer.importDocument("examples/example1.graph.xml", useCache=False)
+        d2 = importer.importDocument("examples/example1.graph.xml", streaming=True)
+
+        self.assertDocumentsEqual(d1, d2)
+
+    def test_import_example_1_expat(self):
+        importer = GImporter()
+
+        d1 = importer.importDocument("examples/example1.graph.xml", useCache=False)
+        d2 = importer.importDocument("examples/example1.graph.xml", backend="expat", useCache=False)
+        d3 = importer.importDocument("examples/example1.graph.xml", streaming=True, backend="expat")
+
+        self.assertDocumentsEqual(d1, d2)
+        self.assertDocumentsEqual(d1, d3)
+
+    def test_import_example_1_in_parallel(self):
+        importer = GImporter()
+
+        d1 = importer.importDocument("examples/example1.graph.xml", useCache=False)
+        d2 = importer.importDocument("examples/example1.graph.xml", parallel=True, maxWorkers=2)
+
+        self.assertDocumentsEqual(d1, d2)
+
+    def test_import_registered_type_in_spawned_processes(self):
+        with open("examples/example1.graph.xml", "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        i = text.index(">", text.index("<section ")) + 1
+        text = text[:i] + "<note id=\"n1\" kind=\"aside\"><p>Note</p></note>" + text[i:]
+
+        GImporter.registerPageElementType(GNote, configureNote)
+
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                filePath = os.path.join(directory, "note.graph.xml")
+
+                with open(filePath, "w", encoding="utf-8") as fo:
+                    fo.write(text)
+
+                d = GImporter().importDocumentInParallel(filePath, maxWorkers=2, mpContext=multiprocessing.get_context("spawn"))
+        finally:
+            del GImporter._pageElementFactories["note"]
+
+        e = d.sections[0].subelements[0]
+
+        self.assertIsInstance(e, GNote)
+        self.assertEqual((e.id, e.kind), ("n1", "aside"))
+
+    def test_import_with_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            importer = GImporter(XMLDocumentCache(directory))
+
+            d1 = importer.importDocument("examples/example1.graph.xml")
+            d2 = importer.importDocument("examples/example1.graph.xml")
+
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+        self.assertDocumentsEqual(importer.importDocument("examples/example1.graph.xml", useCache=False), d1)
+        self.assertDocumentsEqual(d1, d2)
+
+    def test_import_with_invalid_backend(self):
+        importer = GImporter()
+
+        with self.assertRaises(ValueError):
+            importer.importDocument("examples/example1.graph.xml", backend="lxml")
+
+    def test_get_page_elements_from_deeply_nested_xml(self):
+        n = 5000
+        d = XMLParser().parseDocument("<?xml version=\"1.0\" ?><section><p>  Some " + n * "<b>" + "bold" + n * "</b>" + " text  </p></section>")
+
+        p = GImporter()._getPageElementsFromXML(d.root.subelements)[0]
+
+        self.assertIsInstance(p, GParagraph)
+        self.assertEqual(p.subelements[0].text, "Some ")
+        self.assertEqual(p.subelements[-1].text, " text")
+
+        e = p.subelements[1]
+
+        for i in range(n - 1):
+            self.assertIsInstance(e, GBold)
+            e = e.subelements[0]
+
+        self.assertEqual(e.subelements[0].text, "bold")
+
+    def test_register_page_element_type(self):
+        class GAside(GContentElement):
+            _elementNames = ["aside"]
+
+            def __init__(self):
+                super(GAside, self).__init__()
+
+                self.kind = ""
+
+        def configure(importer, e, xmlElement):
+            e.kind = xmlElement.getAttributeValue("kind")
+
+        with open("examples/example1.graph.xml", "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        i = text.index(">", text.index("<section ")) + 1
+        text = text[:i] + "<aside id=\"a1\" kind=\"note\"><p>Aside</p></aside>" + text[i:]
+
+        GImporter.registerPageElementType(GAside, configure)
+
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                filePath = os.path.join(directory, "aside.graph.xml")
+
+                with open(filePath, "w", encoding="utf-8") as fo:
+                    fo.write(text)
+
+                d = GImporter().importDocument(filePath, useCache=False)
+        finally:
+            del GImporter._pageElementFactories["aside"]
+
+        e = d.sections[0].subelements[0]
+
+        self.assertIsInstance(e, GAside)
+        self.assertEqual((e.id, e.kind), ("a1", "note"))
+        self.assertIsInstance(e.subelements[0], GParagraph)
+
+    @parameterized.expand([
+        (GParagraph,),
+        (GHeading,),
+        (GBold,),
+        (GHyperlink,),
+        (GVariable,),
+        (GCitation,),
+        (GTemplate,),
+        (GPageTemplate,),
+        (GHeader,),
+        (GFooter,),
+        (GSection,),
+    ])
+    def test_content_element_layout(self, elementType):
+        e = elementType()
+
+        self.assertFalse(hasattr(e, "__dict__"))
+        self.assertEqual((e.subelements, e.id, e.styleClass, e.style, e.language), ([], "", "", "", ""))
+
+        with self.assertRaises(AttributeError):
+            e.undeclaredAttribute = ""
+
+    def test_style_class_names(self):
+        e = GParagraph()
+        e.styleClass = "first  second -third second .fourth"
+
+        self.assertEqual(e.styleClassNames, frozenset(["first", "second", "-third"]))
+        self.assertIs(e.styleClassNames, e.styleClassNames)
+
+        e.styleClass = "fifth"
+
+        self.assertEqual(e.styleClassNames, frozenset(["fifth"]))
+        self.assertEqual(StyleResolver().selectElementsByClassName([e, GParagraph()], "fifth"), [e])
+
+    def test_linearise(self):
+        s = GSection()
+        p1 = GParagraph()
+        p2 = GParagraph()
+        b = GBold()
+        t1 = GTextElement("a")
+        t2 = GTextElement("b")
+        t3 = GTextElement("c")
+        b.subelements = [t2]
+        p1.subelements = [t1, b]
+        p2.subelements = [t3]
+        s.subelements = [p1, p2]
+
+        self.assertEqual(StyleResolver().linearise([s]), [s, p1, p2, t1, b, t2, t3])
+
+    def test_style_properties_are_copied_on_write(self):
+        p1 = GParagraph()
+        p2 = GParagraph()
+
+        self.assertIsNone(p1._styleProperties)
+        self.assertEqual(dict(p1.styleProperties), GParagraph._defaultStyleProperties)
+
+        p1.styleProperties["font-weight"] = GParagraph._defaultStyleProperties["font-weight"]
+
+        self.assertIsNone(p1._styleProperties)
+
+        p1.styleProperties["font-weight"] = "bold"
+
+        self.assertEqual(p1.styleProperties["font-weight"], "bold")
+        self.assertEqual(p2.styleProperties["font-weight"], GParagraph._defaultStyleProperties["font-weight"])
+        self.assertNotEqual(GParagraph._defaultStyleProperties["font-weight"], "bold")
+        self.assertIsNone(p2._styleProperties)
+
+        p2.styleProperties = {"font-name": "Serif"}
+
+        self.assertEqual(dict(p2.styleProperties), {"font-name": "Serif"})
+        self.assertEqual(dict(GParagraph().styleProperties), GParagraph._defaultStyleProperties)
+
+    def test_text_runs(self):
+        p = GParagraph()
+        b = GBold()
+        b.subelements.append(GTextElement("bold"))
+        p.subelements = [GTextElement("a"), b, GTextElement("bc"), GTextElement("")]
+        p.subelements[2].styleProperties["font-weight"] = "bold"
+
+        p.compactTextRuns()
+
+        self.assertIsInstance(p.subelements, GTextRuns)
+        self.assertIsInstance(b.subelements, list)
+        self.assertEqual(len(p.subelements), 4)
+        self.assertIs(p.subelements[1], b)
+        self.assertEqual([e.text for e in p.subelements if isinstance(e, GTextElement)], ["a", "bc", ""])
+        self.assertEqual(list(p.subelements.iterTextsAndElements()), ["a", b, "bc", ""])
+        self.assertEqual(p.subelements[-2].styleProperties["font-weight"], "bold")
+        self.assertEqual(p.subelements[0].styleProperties["font-weight"], "inherit")
+
+        p.subelements[0].text = "xyz"
+        p.subelements[0].styleProperties["font-weight"] = "bold"
+
+        self.assertEqual([e.text for e in p.subelements[::2]], ["xyz", "bc"])
+        self.assertEqual(p.subelements._styleIds[0], p.subelements._styleIds[1])
+
+        p.subelements.insert(1, GTextElement("d"))
+        del p.subelements[2]
+
+        self.assertEqual(list(p.subelements.iterTextsAndElements()), ["xyz", "d", "bc", ""])
+        self.assertEqual(p.subelements[0].styleProperties["font-weight"], "bold")
+
+    def test_register_page_element_type_with_subclass(self):
+        class NoteImporter(GImporter):
+            pass
+
+        NoteImporter.registerPageElementType(GNote, configureNote)
+
+        self.assertIs(NoteImporter._pageElementFactories["note"].elementType, GNote)
+        self.assertNotIn("note", GImporter._pageElementFactories)
+        self.assertIs(NoteImporter._pageElementFactories["p"], GImporter._pageElementFactories["p"])
+
+    def test_register_page_element_type_without_subelements(self):
+        class GMarker(GContentElement):
+            _elementNames = ["marker"]
+
+        class MarkerImporter(GImporter):
+            pass
+
+        MarkerImporter.registerPageElementType(GMarker, hasSubelements=False)
+
+        with open("examples/example1.graph.xml", "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        i = text.index(">", text.index("<section ")) + 1
+        text = text[:i] + "<marker id=\"m1\"><p>Ignored</p></marker>" + text[i:]
+
+        with tempfile.TemporaryDirectory() as directory:
+            filePath = os.path.join(directory, "marker.graph.xml")
+
+            with open(filePath, "w", encoding="utf-8") as fo:
+                fo.write(text)
+
+            for options in [{"useCache": False}, {"streaming": True}]:
+                e = MarkerImporter().importDocument(filePath, **options).sections[0].subelements[0]
+
+                self.assertIsInstance(e, GMarker)
+                self.assertEqual((e.id, e.subelements), ("m1", []))
+
+    def test_validation_error_location(self):
+        with open("examples/example1.graph.xml", "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        i = text.index(">", text.index("<section ")) + 1
+        text = text[:i] + "<invalid-element />" + text[i:]
+        line = text.count("\n", 0, i) + 1
+        column = i - text.rfind("\n", 0, i)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filePath = os.path.join(directory, "invalid.graph.xml")
+
+            with open(filePath, "w", encoding="utf-8") as fo:
+                fo.write(text)
+
+            for options in [{"useCache": False}, {"parallel": True, "maxWorkers": 2}, {"streaming": True}]:
+                with self.assertRaises(GraphValidationError) as context:
+                    GImporter().importDocument(filePath, **options)
+
+                self.assertEqual((context.exception.line, context.exception.column), (line, column))
+                self.assertIn("line {}, column {}".format(line, column), str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
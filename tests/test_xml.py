@@ -1,9 +1,21 @@
+import copy
+import gc
+import glob
+import io
+import os
+import pickle
+import sys
+import tempfile
+import tracemalloc
 import unittest
 from parameterized import parameterized
 
 from graph.xml import *
 
 
+exampleFilePaths = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "*.xml")))
+
+
 class TestXML(unittest.TestCase):
 
     @parameterized.expand([
@@ -41,6 +53,28 @@ class TestXML(unittest.TestCase):
         self.assertEqual(a.name, name)
         self.assertEqual(a.value, value)
 
+    @parameterized.expand([
+        ["This is some text", "This is some text", 17],
+        ["This  is\n\tsome text<b>", "This is some text", 19],
+        ["   <b>", " ", 3],
+        ["text>", "text", 4],
+    ])
+    def test_parse_text_element(self, text, expectedText, position):
+        parser = XMLParser()
+        marker = Marker()
+
+        t = parser._getTextElement(text, marker)
+
+        self.assertTrue(isinstance(t, XMLTextElement))
+        self.assertEqual(t.text, expectedText)
+        self.assertEqual(marker.p, position)
+
+    def test_parse_unterminated_attribute_value(self):
+        parser = XMLParser()
+
+        with self.assertRaises(XMLParsingError):
+            parser._getAttribute("id=\"box1", Marker())
+
     @parameterized.expand([
         ["<heading1></heading1>", "heading1", [], 0, ""],
         ["<heading1 id=\"box1\"></heading1>", "heading1", [["id", "box1"]], 0, ""],
@@ -62,6 +96,574 @@ class TestXML(unittest.TestCase):
         self.assertEqual(len(e.subelements), numberOfSubelements)
         self.assertEqual(e.innerText, innerText)
 
+    @parameterized.expand([
+        [XMLParser],
+        [ExpatXMLParser],
+    ])
+    def test_parse_document_interns_names(self, parserType):
+        parser = parserType()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document><p style-class=\"a\">A</p><p style-class=\"b\">B</p></document>")
+
+        p1 = d.root.subelements[0]
+        p2 = d.root.subelements[1]
+
+        self.assertIs(p1.name, p2.name)
+        self.assertIs(p1.attributes[0].name, p2.attributes[0].name)
+
+    def test_parse_document_sets_relational_properties(self):
+        parser = XMLParser()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document><p>This is <b>some</b> text</p></document>")
+
+        p = d.root.subelements[0]
+        b = p.subelements[1]
+
+        self.assertEqual(d.root.depth, 0)
+        self.assertEqual(p.depth, 1)
+        self.assertEqual(b.depth, 2)
+        self.assertEqual(b.subelements[0].depth, 3)
+        self.assertIs(p.superelement, d.root)
+        self.assertIs(b.superelement, p)
+        self.assertIs(b.subelements[0].superelement, b)
+        self.assertIs(b.root, d.root)
+        self.assertIs(b.subelements[0].root, d.root)
+        self.assertIs(b.document, d)
+        self.assertIs(b.subelements[0].document, d)
+
+    def test_parse_deeply_nested_document(self):
+        parser = XMLParser()
+        n = 5000
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?>" + n * "<d>" + "text" + n * "</d>")
+
+        e = d.root
+
+        while e.hasSubelements and isinstance(e.firstSubelement, XMLElement):
+            e = e.firstSubelement
+
+        self.assertEqual(e.depth, n - 1)
+        self.assertEqual(e.innerText, "text")
+
+    @parameterized.expand([
+        [1],
+        [7],
+        [65536],
+    ])
+    def test_iter_parse(self, chunkSize):
+        parser = XMLParser()
+        text = "<?xml version=\"1.0\" ?>\n<document a=\"1\">\n    <p id='p1'> This is <b>some</b>  text </p>\n    <lb />\n</document>"
+
+        events = [(event, e.text if event == "text" else e.name, e.depth) for event, e in parser.iterParse(io.StringIO(text), chunkSize) if event != "declaration"]
+
+        self.assertEqual(events, [
+            ("start", "document", 0),
+            ("start", "p", 1),
+            ("text", " This is ", 2),
+            ("start", "b", 2),
+            ("text", "some", 3),
+            ("end", "b", 2),
+            ("text", " text ", 2),
+            ("end", "p", 1),
+            ("text", " ", 1),
+            ("start", "lb", 1),
+            ("end", "lb", 1),
+            ("end", "document", 0),
+        ])
+
+    def test_build_element_from_events(self):
+        parser = XMLParser()
+        text = "<?xml version=\"1.0\" ?><document><p>This is <b>some</b> text</p></document>"
+
+        events = parser.iterParse(io.StringIO(text), 4)
+
+        next(events)
+        event, root = next(events)
+
+        parser.buildElementFromEvents(root, events)
+
+        self.assertEqual(root.name, "document")
+        self.assertEqual(len(root.subelements), 1)
+        self.assertEqual(len(root.subelements[0].subelements), 3)
+        self.assertEqual(root.innerText, "This is some text")
+
+    def test_get_elements_by_name(self):
+        parser = XMLParser()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document><d id=\"1\"><p id=\"2\" /></d><p id=\"3\"><p id=\"4\" /></p></document>")
+
+        self.assertEqual([e.getAttributeValue("id") for e in d.root.getElementsByName("p")], ["2", "3", "4"])
+        self.assertEqual([e.getAttributeValue("id") for e in d.root.getElementsByName("p", False)], ["3"])
+        self.assertEqual(d.root.getFirstElementWithName("p").getAttributeValue("id"), "2")
+        self.assertEqual([e.getAttributeValue("id") for e in d.root.subelements[1].getElementsByName("p")], ["4"])
+        self.assertEqual(d.root.getElementsByName("q"), [])
+        self.assertEqual(d.root.getFirstElementWithName("q"), None)
+
+    def test_element_index_is_built_after_repeated_queries(self):
+        parser = XMLParser()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document><d id=\"1\"><p id=\"2\" /></d><p id=\"3\"><p id=\"4\" /></p></document>")
+
+        self.assertEqual(d.root.findFirst("p").getAttributeValue("id"), "2")
+        self.assertIsNone(d._elementIndex)
+        self.assertIsNone(d.root.subelements[0]._indexEntry)
+
+        for i in range(XMLDocument._numberOfQueriesBeforeIndexing + 1):
+            ids = [e.getAttributeValue("id") for e in d.root.getElementsByName("p")]
+
+        self.assertIsNotNone(d._elementIndex)
+        self.assertEqual(ids, ["2", "3", "4"])
+        self.assertEqual(d.root.findFirst("p").getAttributeValue("id"), "2")
+        self.assertEqual([e.getAttributeValue("id") for e in d.root.subelements[1].iterElementsByName("p")], ["4"])
+
+        d.root.subelements[0].subelements.append(XMLElement("p"))
+
+        self.assertIsNone(d._elementIndex)
+        self.assertEqual(len(d.root.getElementsByName("p")), 4)
+
+    def test_iter_descendants(self):
+        parser = XMLParser()
+
+        e = parser._getElement("<document><d><p>a</p>b</d><p /></document>", Marker())
+
+        self.assertEqual([d.name if isinstance(d, XMLElement) else d.text for d in e.iterDescendants()], ["d", "p", "a", "b", "p"])
+
+    def test_iter_elements_by_name(self):
+        parser = XMLParser()
+
+        e = parser._getElement("<document><d><p id=\"1\" /></d><p id=\"2\"><p id=\"3\" /></p></document>", Marker())
+
+        self.assertEqual([p.getAttributeValue("id") for p in e.iterElementsByName("p")], ["1", "2", "3"])
+        self.assertEqual([p.getAttributeValue("id") for p in e.iterElementsByName("p", False)], ["2"])
+        self.assertEqual(e.findFirst("p").getAttributeValue("id"), "1")
+        self.assertEqual(e.findFirst("p", False).getAttributeValue("id"), "2")
+        self.assertEqual(e.findFirst("q"), None)
+
+    @parameterized.expand([
+        ["pickle", lambda d: pickle.loads(pickle.dumps(d))],
+        ["deepcopy", copy.deepcopy]
+    ])
+    def test_copy_document(self, name, copyDocument):
+        d1 = XMLParser().parseDocument("<?xml version=\"1.0\" ?><document title=\"A\"><d id=\"1\"><p>Some <b>bold</b> text</p></d></document>")
+        d2 = copyDocument(d1)
+
+        self.assertElementsEqual(d1.root, d2.root)
+        self.assertIs(d2.root.document, d2)
+        self.assertIs(d2.root.subelements.owner, d2.root)
+        self.assertIs(d2.root.attributes.owner, d2.root)
+
+        p = XMLElement("p")
+        d2.root.subelements[0].subelements.append(p)
+
+        self.assertIs(p.superelement, d2.root.subelements[0])
+        self.assertEqual(len(d2.root.getElementsByName("p")), 2)
+        self.assertEqual(len(d1.root.getElementsByName("p")), 1)
+
+    def test_get_elements_by_name_after_changes(self):
+        parser = XMLParser()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document><d><p /></d></document>")
+        division = d.root.subelements[0]
+
+        self.assertEqual(len(d.root.getElementsByName("p")), 1)
+
+        p = XMLElement("p")
+        division.subelements.append(p)
+
+        self.assertIs(p.superelement, division)
+        self.assertEqual(len(d.root.getElementsByName("p")), 2)
+
+        p.subelements.append(XMLElement("p"))
+
+        self.assertEqual(len(d.root.getElementsByName("p")), 3)
+        self.assertEqual(len(p.getElementsByName("p")), 1)
+
+        del division.subelements[0]
+
+        self.assertEqual(len(d.root.getElementsByName("p")), 2)
+
+        division.subelements = []
+
+        self.assertEqual(d.root.getElementsByName("p"), [])
+
+    def test_inner_text_after_changes(self):
+        parser = XMLParser()
+
+        e = parser._getElement("<p>This is <b>some <i>more</i></b> text</p>", Marker())
+        b = e.subelements[1]
+
+        self.assertEqual(e.innerText, "This is some more text")
+        self.assertEqual(b.innerText, "some more")
+
+        b.subelements[1].subelements[0].text = "other"
+
+        self.assertEqual(e.innerText, "This is some other text")
+        self.assertEqual(b.innerText, "some other")
+
+        b.subelements.append(XMLTextElement("!"))
+
+        self.assertEqual(e.innerText, "This is some other! text")
+
+        e.subelements = [XMLTextElement("Text")]
+
+        self.assertEqual(e.innerText, "Text")
+
+    def test_attributes_after_changes(self):
+        e = XMLElement("p")
+
+        self.assertFalse(e.hasAttribute("id"))
+
+        e.setAttributeValue("id", "p1")
+
+        self.assertTrue(e.hasAttribute("id"))
+        self.assertEqual(e.getAttributeValue("id"), "p1")
+
+        e.attributes.append(XMLAttribute("style", "font-colour: red;"))
+
+        self.assertEqual(e.getAttributeValue("style"), "font-colour: red;")
+
+        e.attributes = [XMLAttribute("style-class", "a"), XMLAttribute("style-class", "b")]
+
+        self.assertFalse(e.hasAttribute("id"))
+        self.assertEqual(e.getAttributeValue("style-class"), "a")
+
+    def test_element_export_flags(self):
+        e = XMLElement("p")
+
+        self.assertFalse(e.isSelfClosing)
+        self.assertEqual((e.lineBreakBeforeOpeningTag, e.lineBreakAfterOpeningTag, e.lineBreakBeforeClosingTag, e.lineBreakAfterClosingTag), (True, True, True, False))
+
+        e.isSelfClosing = True
+        e.setLineBreaks(False, True, False, True)
+
+        self.assertTrue(e.isSelfClosing)
+        self.assertEqual((e.lineBreakBeforeOpeningTag, e.lineBreakAfterOpeningTag, e.lineBreakBeforeClosingTag, e.lineBreakAfterClosingTag), (False, True, False, True))
+
+    def test_write_document(self):
+        p = XMLElement("p")
+        p.attributes.append(XMLAttribute("id", "p1"))
+        p.subelements.append(XMLTextElement("Some "))
+
+        b = XMLElement("b")
+        b.setLineBreaks(False, False, False, False)
+        b.subelements.append(XMLTextElement("bold"))
+        p.subelements.append(b)
+
+        lb = XMLElement("lb")
+        lb.isSelfClosing = True
+        p.subelements.append(lb)
+
+        root = XMLElement("document")
+        root.subelements.append(p)
+
+        d = XMLDocument(XMLDeclaration(), root)
+        stream = io.StringIO()
+
+        XMLExporter().writeDocument(d, stream)
+
+        self.assertEqual(stream.getvalue(), "<?xml  ?>\n\n<document>\n\n    <p id=\"p1\">\n    Some <b>bold</b>\n        <lb />\n    </p>\n</document>")
+        self.assertEqual(XMLExporter().exportDocument(d), stream.getvalue())
+
+    def test_export_document_leaves_tree_unchanged(self):
+        root = XMLElement("document")
+        d = XMLDocument(XMLDeclaration(), root)
+
+        p = XMLElement("p")
+        p.subelements.append(XMLTextElement("Text"))
+        root.subelements.append(p)
+
+        self.assertEqual(XMLExporter().exportDocument(d), "<?xml  ?>\n\n<document>\n\n    <p>\n    Text\n    </p>\n</document>")
+        self.assertEqual(p.depth, 0)
+        self.assertIsNone(p.document)
+        self.assertIsNone(p.root)
+
+    @parameterized.expand([
+        ["python", XMLParser],
+        ["expat", ExpatXMLParser]
+    ])
+    def test_parse_entities(self, name, parserType):
+        d = parserType().parseDocument("<?xml version=\"1.0\" ?><p title=\"&quot;A&quot; &amp; 'B'\">1 &lt; 2 &amp;&amp; 3 &gt; 2 &#65;&#x42; &apos;</p>")
+
+        self.assertEqual(d.root.getAttributeValue("title"), "\"A\" & 'B'")
+        self.assertEqual(d.root.innerText, "1 < 2 && 3 > 2 AB '")
+
+    def test_parse_invalid_character_reference(self):
+        with self.assertRaises(XMLParsingError):
+            XMLParser().parseDocument("<?xml version=\"1.0\" ?><p>&#x110000;</p>")
+
+    def test_export_escapes_text_and_attribute_values(self):
+        e = XMLElement("p")
+        e.setLineBreaks(False, False, False, False)
+        e.attributes.append(XMLAttribute("title", "\"A\" & <B>"))
+        e.subelements.append(XMLTextElement("1 < 2 && \"3\" > 2"))
+
+        t = XMLExporter().exportElement(e)
+
+        self.assertEqual(t, "<p title=\"&quot;A&quot; &amp; &lt;B&gt;\">1 &lt; 2 &amp;&amp; \"3\" &gt; 2</p>")
+
+        d = XMLParser().parseDocument("<?xml version=\"1.0\" ?>" + t)
+
+        self.assertEqual(d.root.getAttributeValue("title"), "\"A\" & <B>")
+        self.assertEqual(d.root.innerText, "1 < 2 && \"3\" > 2")
+
+    def test_parse_source_positions(self):
+        text = "<?xml version=\"1.0\" ?>\n<document>\n    <p>Some <b>bold</b> text</p>\n    <lb />\n</document>"
+        d = XMLParser().parseDocument(text)
+
+        for e in [d.root] + list(d.root.iterElementsByName("p")) + list(d.root.iterElementsByName("b")) + list(d.root.iterElementsByName("lb")):
+            self.assertEqual(XMLParser().parseDocument("<?xml version=\"1.0\" ?>" + text[e.sourceStart:e.sourceEnd]).root.name, e.name)
+
+        lb = d.root.getFirstElementWithName("lb")
+
+        self.assertEqual(text[lb.sourceStart:lb.sourceEnd], "<lb />")
+
+    @parameterized.expand([
+        ["text", "A paragraph", "An edited paragraph"],
+        ["element", "<b>bold</b>", "<b>bold</b> <i>italic</i>"],
+        ["outside", "<sections>", "<sections a=\"1\">"],
+        ["unbalanced", "<b>bold</b>", "<b>bold"]
+    ])
+    def test_reparse_document(self, name, old, new):
+        oldText = "<?xml version=\"1.0\" ?>\n<document>\n    <sections>\n        <section>\n            <p>A paragraph with <b>bold</b> text</p>\n        </section>\n        <section>\n            <p>Another paragraph</p>\n        </section>\n    </sections>\n</document>"
+        newText = oldText.replace(old, new)
+        parser = XMLParser()
+
+        d = parser.parseDocument(oldText)
+        secondSection = d.root.getElementsByName("section")[1]
+
+        if name == "unbalanced":
+            with self.assertRaises(XMLParsingError):
+                parser.reparseDocument(d, oldText, newText)
+            return
+
+        self.assertIs(parser.reparseDocument(d, oldText, newText), d)
+
+        d2 = parser.parseDocument(newText)
+
+        self.assertElementsEqual(d.root, d2.root)
+        self.assertEqual([(e.sourceStart, e.sourceEnd) for e in d.root.iterElementsByName("p")], [(e.sourceStart, e.sourceEnd) for e in d2.root.iterElementsByName("p")])
+        self.assertEqual(d.root.sourceEnd, len(newText))
+        self.assertTrue(all(e.document is d for e in d.root.iterDescendants() if isinstance(e, XMLElement)))
+
+        if name != "outside":
+            self.assertIs(d.root.getElementsByName("section")[1], secondSection)
+
+    def test_source_locations(self):
+        text = "<?xml version=\"1.0\" ?>\n<document>\n    <p>Some <b>bold</b> text</p>\n</document>"
+        d = XMLParser().parseDocument(text)
+
+        p = d.root.getFirstElementWithName("p")
+        b = d.root.getFirstElementWithName("b")
+
+        self.assertEqual(d.root.getSourceLocation(), (2, 1))
+        self.assertEqual(p.getSourceLocation(), (3, 5))
+        self.assertEqual(p.subelements[0].getSourceLocation(), (3, 8))
+        self.assertEqual(b.getSourceLocation(), (3, 13))
+        self.assertEqual(text[b.subelements[0].sourceStart:b.subelements[0].sourceEnd], "bold")
+        self.assertIsNone(XMLElement("p").getSourceLocation())
+
+    @parameterized.expand([
+        ["python", XMLParser],
+        ["expat", ExpatXMLParser]
+    ])
+    def test_parsing_error_location(self, name, parserType):
+        with self.assertRaises(XMLParsingError) as context:
+            parserType().parseDocument("<?xml version=\"1.0\" ?>\n<document>\n    <p>Text</q>\n</document>")
+
+        self.assertEqual(context.exception.line, 3)
+        self.assertIn("line 3", str(context.exception))
+
+    @parameterized.expand([
+        ["text", XMLParser, str],
+        ["bytes", XMLBytesParser, bytes],
+    ])
+    def test_parsed_document_does_not_keep_text(self, name, parserType, textType):
+        text = "<?xml version=\"1.0\" ?>\n<document>\n    <p>Some <b>bold</b> text</p>\n</document>"
+        text = text.encode("utf-8") if textType == bytes else text
+
+        numberOfReferences = sys.getrefcount(text)
+        d = parserType().parseDocument(text)
+
+        self.assertEqual(sys.getrefcount(text), numberOfReferences)
+        self.assertEqual(d.root.getFirstElementWithName("b").getSourceLocation(), (3, 13))
+
+    def test_iter_parse_source_positions(self):
+        text = "<?xml version=\"1.0\" ?>\n<document>\n    <p>Some <b>bold</b> text</p>\n    <lb />\n</document>"
+        d = XMLParser().parseDocument(text)
+
+        positions1 = [(e.sourceStart, e.sourceEnd) for e in [d.root] + list(d.root.iterDescendants())]
+        elements = [e for event, e in XMLParser().iterParse(io.StringIO(text), 7) if event in ["start", "text"]]
+        positions2 = [(e.sourceStart, e.sourceEnd) for e in elements]
+
+        self.assertEqual(positions1, positions2)
+        self.assertEqual([e.getSourceLocation() for e in elements], [e.getSourceLocation() for e in [d.root] + list(d.root.iterDescendants())])
+
+    def test_iter_parse_error_location(self):
+        text = "<?xml version=\"1.0\" ?>\n<document>\n    <p>Text</q>\n</document>"
+
+        with self.assertRaises(XMLParsingError) as context:
+            list(XMLParser().iterParse(io.StringIO(text), 7))
+
+        self.assertEqual(context.exception.line, 3)
+        self.assertIn("line 3", str(context.exception))
+
+    def test_iter_parse_memory(self):
+        def getPeakMemory(numberOfLines):
+            fo = io.StringIO("<?xml version=\"1.0\" ?>\n<document>\n" + "    <p>Some <b>bold</b> text</p>\n" * numberOfLines + "</document>")
+            location = None
+
+            tracemalloc.start()
+
+            for i, (event, e) in enumerate(XMLParser().iterParse(fo, 4096)):
+                if event == "start" and e.name == "p":
+                    location = e.getSourceLocation()
+
+                # Elements and their subelement lists refer to each other, so 
+                # they're collected here rather than whenever the collector 
+                # gets to them.
+                if i % 10000 == 0:
+                    gc.collect()
+
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.assertEqual(location, (numberOfLines + 2, 5))
+
+            return peak
+
+        # The smaller file is parsed first, so that it pays for anything that's 
+        # only allocated once.
+        peak1 = getPeakMemory(10000)
+        peak2 = getPeakMemory(80000)
+
+        self.assertLess(peak2, 1.5 * peak1)
+
+    @parameterized.expand([
+        ["python", XMLParser],
+        ["expat", ExpatXMLParser]
+    ])
+    def test_document_cache(self, name, parserType):
+        parser = parserType()
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = XMLDocumentCache(os.path.join(directory, "cache"))
+            filePath = os.path.join(directory, "document.xml")
+
+            with open(filePath, "w", encoding="utf-8") as fo:
+                fo.write("<?xml version=\"1.0\" ?>\n<document a=\"1\">\n    <p id='p1'>Some <b>bold</b> text</p>\n    <lb />\n</document>")
+
+            d1 = cache.getDocument(filePath, parser)
+            d2 = cache.getDocument(filePath, parser)
+
+            self.assertEqual(len(os.listdir(os.path.join(directory, "cache"))), 1)
+            self.assertElementsEqual(d1.root, d2.root)
+            self.assertElementsEqual(parser.parseFromFile(filePath).root, d2.root)
+            self.assertEqual(d2.declaration.version, "1.0")
+            self.assertTrue(all(e.document is d2 for e in d2.root.iterDescendants() if isinstance(e, XMLElement)))
+            self.assertEqual(d1.root.getFirstElementWithName("b").getSourceLocation(), d2.root.getFirstElementWithName("b").getSourceLocation())
+
+            with open(filePath, "w", encoding="utf-8") as fo:
+                fo.write("<?xml version=\"1.0\" ?>\n<document a=\"2\" />")
+
+            d3 = cache.getDocument(filePath, parser)
+
+            self.assertEqual(d3.root.getAttributeValue("a"), "2")
+            self.assertEqual(len(d3.root.subelements), 0)
+
+    def test_document_cache_eviction(self):
+        parser = XMLParser()
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = XMLDocumentCache(os.path.join(directory, "cache"), 1)
+
+            for i in range(3):
+                filePath = os.path.join(directory, "document{}.xml".format(i))
+
+                with open(filePath, "w", encoding="utf-8") as fo:
+                    fo.write("<?xml version=\"1.0\" ?><document><p>{}</p></document>".format(i))
+
+                self.assertEqual(cache.getDocument(filePath, parser).root.innerText, str(i))
+
+            self.assertEqual(os.listdir(os.path.join(directory, "cache")), [])
+
+    def assertElementsEqual(self, e1, e2):
+        self.assertEqual(type(e1), type(e2))
+        self.assertEqual(e1.depth, e2.depth)
+
+        if isinstance(e1, XMLTextElement):
+            self.assertEqual(e1.text, e2.text)
+        else:
+            self.assertEqual(e1.name, e2.name)
+            self.assertEqual([(a.name, a.value) for a in e1.attributes], [(a.name, a.value) for a in e2.attributes])
+            self.assertEqual(len(e1.subelements), len(e2.subelements))
+
+            for s1, s2 in zip(e1.subelements, e2.subelements):
+                self.assertIs(s1.superelement, e1)
+                self.assertIs(s2.superelement, e2)
+                self.assertElementsEqual(s1, s2)
+
+    @parameterized.expand([[f] for f in exampleFilePaths])
+    def test_expat_parser_conformance(self, filePath):
+        d1 = XMLParser().parseFromFile(filePath)
+        d2 = ExpatXMLParser().parseFromFile(filePath)
+
+        self.assertEqual([(a.name, a.value) for a in d1.declaration.attributes], [(a.name, a.value) for a in d2.declaration.attributes])
+        self.assertIs(d1.root.document, d1)
+        self.assertIs(d2.root.document, d2)
+        self.assertElementsEqual(d1.root, d2.root)
+
+    @parameterized.expand([
+        ["line_feed", "<p>a&#10;b</p>", "a b"],
+        ["tab_and_spaces", "<p>a&#9; &#x20;b</p>", "a b"],
+        ["only_a_reference", "<p><b>a</b>&#10;<b>b</b>&#10;</p>", "a b"],
+        ["letters", "<p>&#65;&#x42;  c</p>", "AB c"],
+        ["non_breaking_space", "<p>x&#160;y &#xA0; z</p>", "x\u00a0y \u00a0 z"],
+        ["ideographic_space", "<p>x&#x3000;y</p>", "x\u3000y"],
+    ])
+    def test_expat_parser_conformance_with_character_references(self, name, text, innerText):
+        text = "<?xml version=\"1.0\" ?>" + text
+        d1 = XMLParser().parseDocument(text)
+        d2 = ExpatXMLParser().parseDocument(text)
+
+        self.assertEqual(d1.root.innerText, innerText)
+        self.assertElementsEqual(d1.root, d2.root)
+
+    @parameterized.expand([[f, lineBreak] for f in exampleFilePaths for lineBreak in ["lf", "crlf"]])
+    def test_parse_memory_mapped_file(self, filePath, lineBreak):
+        parser = XMLParser()
+
+        with open(filePath, "r", encoding="utf-8") as fo:
+            text = fo.read()
+
+        with tempfile.TemporaryDirectory() as directory:
+            filePath = os.path.join(directory, "document.xml")
+
+            with open(filePath, "w", encoding="utf-8", newline="\r\n" if lineBreak == "crlf" else "\n") as fo:
+                fo.write(text)
+
+            d1 = parser.parseFromFile(filePath)
+            d2 = parser.parseFromFile(filePath, memoryMap=True)
+
+        self.assertElementsEqual(d1.root, d2.root)
+
+    def test_parse_bytes(self):
+        parser = XMLBytesParser()
+
+        d = parser.parseDocument("<?xml version=\"1.0\" ?><document title=\"Café\"><p>Crème  brûlée <b>à la</b> carte</p></document>".encode("utf-8"))
+
+        self.assertEqual(d.declaration.version, "1.0")
+        self.assertEqual(d.root.getAttributeValue("title"), "Café")
+        self.assertEqual(d.root.subelements[0].name, "p")
+        self.assertEqual(d.root.innerText, "Crème brûlée à la carte")
+
+    def test_expat_parser_events(self):
+        text = "<?xml version=\"1.0\" ?>\n<document a=\"1\">\n    <p id='p1'> This is <b>some</b>  text </p>\n    <lb />\n</document>"
+
+        events1 = [(event, e.text if event == "text" else e.name, e.depth) for event, e in XMLParser().iterParse(io.StringIO(text), 5) if event != "declaration"]
+        events2 = [(event, e.text if event == "text" else e.name, e.depth) for event, e in ExpatXMLParser().iterParse(io.StringIO(text), 5) if event != "declaration"]
+
+        self.assertEqual(events1, events2)
+
     def test_parse_example_1(self):
         parser = XMLParser()
 